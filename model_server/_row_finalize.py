@@ -0,0 +1,80 @@
+# _row_finalize.py
+"""
+Chroma 검색 결과 한 행(metadata, 유사도) → 검색 결과 dict 정리 (rag_retriever에서 사용).
+
+행마다 도는 순수 파이썬 문자열/dict 처리라서 mypyc로 미리 컴파일해 둘 수 있게 분리해 둠.
+    pip install mypy
+    cd model_server && mypyc _row_finalize.py
+빌드하면 같은 폴더에 _row_finalize.*.so가 생기고, import 시 .py보다 먼저 잡힌다.
+빌드하지 않았으면 이 파일이 그대로 import 된다. (동작은 같음)
+"""
+
+import json
+from typing import Any, Dict, List
+
+# mood_keywords 문자열 정리용: 괄호/따옴표 제거를 한 번의 translate로
+_MOOD_STRIP_TABLE = str.maketrans("", "", "[]'")
+
+
+def split_moods(raw: str) -> List[str]:
+    """"['아늑한', '우드톤']" / "아늑한, 우드톤" → ["아늑한", "우드톤"]"""
+    out: List[str] = []
+    for part in raw.translate(_MOOD_STRIP_TABLE).split(","):
+        p = part.strip()
+        if p:
+            out.append(p)
+    return out
+
+
+def finalize_row(m: Dict[str, Any], sim: float) -> Dict[str, Any]:
+    """
+    Chroma 결과 한 행(metadata, 유사도) → 검색 결과 dict.
+    - sim_score(0~1) 기록
+    - price 정수 변환, mood_keywords 문자열 → 리스트
+      (인덱스에 미리 만들어 둔 price_int / mood_keywords_json이 있으면 그대로 사용,
+       예전 인덱스의 행만 아래 파싱 경로로 처리)
+    """
+    # Chroma는 query마다 새 metadata dict를 만들어 주므로 복사 없이 그 자리에서 수정
+    item = m
+    item["sim_score"] = round(sim, 4)
+
+    price_int = item.get("price_int")
+    if type(price_int) is int:
+        item["price"] = price_int
+
+    moods_ready = False
+    moods_json = item.pop("mood_keywords_json", None)
+    if moods_json:
+        try:
+            # 인덱스 생성 시 이미 정리된 리스트 → 아래 문자열 정규화 생략
+            item["mood_keywords"] = json.loads(moods_json)
+            moods_ready = True
+        except ValueError:
+            pass
+
+    # price 정수 변환 시도 (인덱스에는 이미 int로 저장되어 있어 보통 그대로 통과)
+    if "price" in item and type(item["price"]) is not int:
+        try:
+            item["price"] = int(item["price"])
+        except Exception:
+            try:
+                s = str(item["price"]).replace(",", "").strip()
+                item["price"] = int(s)
+            except Exception:
+                # 실패하면 그대로 둔다
+                pass
+
+    # mood_keywords 정규화 (문자열 → 리스트)
+    if not moods_ready and "mood_keywords" in item:
+        moods = item["mood_keywords"]
+        if type(moods) is str:
+            # 혹시 모를 괄호/따옴표 정리 후 쉼표로 분리
+            item["mood_keywords"] = split_moods(moods)
+        elif isinstance(moods, list):
+            item["mood_keywords"] = [
+                str(p).strip()
+                for p in moods
+                if str(p).strip()
+            ]
+
+    return item
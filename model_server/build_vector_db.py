@@ -7,7 +7,8 @@ import chromadb
 
 from openai import OpenAI
 
-from config import EMBEDDING_MODEL_NAME, PRODUCTS_JSON_PATH, VECTOR_DB_PATH
+from config import EMBEDDING_DIMENSIONS, EMBEDDING_MODEL_NAME, PRODUCTS_JSON_PATH, VECTOR_DB_PATH
+from rag_index import HNSW_METADATA
 
 
 def sanitize_metadata(item: dict) -> dict:
@@ -27,11 +28,12 @@ client = OpenAI()  # OPENAI_API_KEY를 env에서 읽어옴
 
 def embed_texts(texts: List[str]) -> List[List[float]]:
     """
-    OpenAI text-embedding-3-large로 임베딩 생성
+    OpenAI 임베딩 모델(EMBEDDING_MODEL_NAME, EMBEDDING_DIMENSIONS차원)로 임베딩 생성
     """
     resp = client.embeddings.create(
         model=EMBEDDING_MODEL_NAME,
         input=texts,
+        dimensions=EMBEDDING_DIMENSIONS,
     )
     return [d.embedding for d in resp.data]
 
@@ -40,7 +42,7 @@ def build_vector_db():
     print("▶ Vector DB 빌드 시작")
     print(f"  - PRODUCTS_JSON_PATH = {PRODUCTS_JSON_PATH}")
     print(f"  - VECTOR_DB_PATH     = {VECTOR_DB_PATH}")
-    print(f"  - EMBEDDING_MODEL    = {EMBEDDING_MODEL_NAME}")
+    print(f"  - EMBEDDING_MODEL    = {EMBEDDING_MODEL_NAME} ({EMBEDDING_DIMENSIONS}차원)")
 
     with open(PRODUCTS_JSON_PATH, "r", encoding="utf-8") as f:
         items = json.load(f)
@@ -57,7 +59,7 @@ def build_vector_db():
 
     collection = chroma_client.get_or_create_collection(
         name="products",
-        metadata={"hnsw:space": "cosine"},
+        metadata=HNSW_METADATA,
     )
 
     print("  - 컬렉션에 문서 + 임베딩 추가 중...")
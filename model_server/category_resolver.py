@@ -5,7 +5,7 @@
 OpenAI 임베딩 기반으로 추론하는 모듈.
 
 - products_all_ver1.json 에서 실제 category_id 목록을 추출
-- OpenAI text-embedding-3-large로
+- OpenAI 임베딩 모델(config.EMBEDDING_MODEL_NAME)로
   카테고리 문장과 유저 입력을 임베딩
 - 코사인 유사도 가장 높은 카테고리를 반환
 """
@@ -14,33 +14,26 @@ import json
 from typing import Optional, List
 
 import numpy as np
-from openai import OpenAI
 
-from config import EMBEDDING_MODEL_NAME, PRODUCTS_JSON_PATH
+from config import EMBEDDING_DIMENSIONS, EMBEDDING_MODEL_NAME, PRODUCTS_JSON_PATH
+from rag_index import get_openai_client
 
 
 # 전역 캐시
-_client: OpenAI | None = None
 _category_labels: List[str] | None = None
 _category_vecs: np.ndarray | None = None
 
 
-def _get_client() -> OpenAI:
-    global _client
-    if _client is None:
-        _client = OpenAI()
-    return _client
-
-
 def _embed_texts(texts: List[str]) -> np.ndarray:
     """
-    OpenAI text-embedding-3-large로 여러 문장 임베딩
+    OpenAI 임베딩 모델로 여러 문장 임베딩
     - 반환: (N, dim) numpy array (L2 정규화 포함)
     """
-    client = _get_client()
+    client = get_openai_client()
     resp = client.embeddings.create(
         model=EMBEDDING_MODEL_NAME,
         input=texts,
+        dimensions=EMBEDDING_DIMENSIONS,
     )
     vecs = np.array([d.embedding for d in resp.data], dtype=np.float32)
 
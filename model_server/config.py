@@ -15,9 +15,24 @@ else:
 DATA_DIR = BASE_DIR / "data"
 VECTOR_DB_DIR = BASE_DIR / "vector_db"
 
+# 🔹 파싱/VLM 결과 디스크 캐시 (서버 재시작 후에도 유지)
+CACHE_DIR = Path(os.environ.get("MOODON_CACHE_DIR", str(BASE_DIR / "cache")))
+PARSE_CACHE_TTL = 7 * 24 * 3600
+VLM_CACHE_TTL = 7 * 24 * 3600
+
 HF_QWEN_MODEL_NAME = "MyeongHo0621/Qwen2.5-14B-Korean"
+# 🔹 LLM 양자화 방식: "nf4"(4bit, 기본) 또는 "int8"(기존 8bit)
+LLM_QUANTIZATION = os.environ.get("LLM_QUANTIZATION", "nf4").lower()
 
-EMBEDDING_MODEL_NAME = "text-embedding-3-large"
+# 🔹 임베딩 모델/차원 (text-embedding-3-small 1024차원: large 3072차원 대비 호출·인덱스 크기 ↓)
+#    ⚠️ 바꾸면 rag_index.py로 'products' 컬렉션을 다시 만들어야 함 (차원이 달라짐)
+EMBEDDING_MODEL_NAME = os.environ.get("EMBEDDING_MODEL_NAME", "text-embedding-3-small")
+EMBEDDING_DIMENSIONS = int(os.environ.get("EMBEDDING_DIMENSIONS", "1024"))
+# 🔹 OpenAI 요청 재시도 횟수 (429/5xx/연결 오류 → SDK가 지수 백오프 + 지터로 재시도)
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "4"))
+# 🔹 동시 요청 상한: OpenAI 임베딩 호출(요금제 rate limit) / Chroma 검색(공유 인덱스 캐시)
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "35"))
+CHROMA_MAX_CONCURRENCY = int(os.environ.get("CHROMA_MAX_CONCURRENCY", "10"))
 VLM_MODEL_NAME = "Qwen/Qwen2.5-VL-7B-Instruct"
 
 PRODUCTS_JSON_PATH = str(DATA_DIR / "products_all_ver1_vlm.json")
@@ -26,6 +41,56 @@ VECTOR_DB_PATH = str(VECTOR_DB_DIR)
 # 🔹 NEW: 정제된 무드 사전 경로
 MOOD_VOCAB_PATH = DATA_DIR / "mood_keywords_clean.json"
 
-RAG_TOP_K = 20
+# 🔹 RAG 검색 설정 (환경변수로 조정 가능, import 시 1회만 읽음)
+RAG_TOP_K = int(os.environ.get("RAG_TOP_K", "20"))
+RAG_RERANK_ENABLED = os.environ.get("RAG_RERANK_ENABLED", "1") != "0"
+# 같은 검색 결과를 재사용하는 최대 시간(초). 상품 데이터가 바뀌어도 이 시간이 지나면 새로 검색
+RAG_SEARCH_CACHE_TTL = 600
+# 🔹 카테고리(DB에 있는 값과 정확히 일치할 때만)/예산을 Chroma where 필터로 검색 단계에서 적용
+RAG_WHERE_FILTER_ENABLED = os.environ.get("RAG_WHERE_FILTER_ENABLED", "1") != "0"
+# LLM이 준 카테고리 표현 → DB category_id 매핑 (선택, 예: {"lighting": "조명"})
+CATEGORY_ALIAS_PATH = DATA_DIR / "category_aliases.json"
 RECOMMEND_TOP_N = 3
+
+# 🔹 쿼리 임베딩 요청 묶기: 이 시간(ms) 안에 여러 스레드에서 들어온 문장을 한 번의 API 호출로
+EMBED_BATCH_WINDOW_MS = float(os.environ.get("EMBED_BATCH_WINDOW_MS", "10"))
+EMBED_MAX_BATCH = int(os.environ.get("EMBED_MAX_BATCH", "256"))
+
+# 🔹 RAG 검색 결과 캐시: 거의 같은 검색 문장(코사인 유사도 ≥ 임계값)이면 Chroma 검색 결과 재사용
+RAG_RESULT_CACHE_ENABLED = os.environ.get("RAG_RESULT_CACHE_ENABLED", "1") != "0"
+RAG_RESULT_CACHE_THRESHOLD = float(os.environ.get("RAG_RESULT_CACHE_THRESHOLD", "0.97"))
+RAG_RESULT_CACHE_TTL = 600
+RAG_RESULT_CACHE_MAX_ENTRIES = 512
+
+# 🔹 랭킹 후 남은 후보가 이 수보다 적으면 LLM 없이 고정 템플릿으로 바로 답변
+RECOMMEND_LLM_MIN = int(os.environ.get("RECOMMEND_LLM_MIN", "4"))
+
+# 🔹 LLM에 넘길 최근 대화 턴 수 (프롬프트 길이 상한)
+MAX_HISTORY_TURNS = 8
+
+# 🔹 서버 세션 보관: 마지막 접근 후 SESSION_TTL초가 지나거나 SESSION_MAX_COUNT를 넘으면
+#    오래된 세션부터 삭제. 세션별 히스토리는 최근 SESSION_MAX_HISTORY개만 유지
+SESSION_TTL = int(os.environ.get("SESSION_TTL", "3600"))
+SESSION_MAX_COUNT = int(os.environ.get("SESSION_MAX_COUNT", "10000"))
+SESSION_MAX_HISTORY = 40
+
+# 🔹 LLM 마이크로 배칭: 이 시간(ms) 안에 동시에 들어온 chat() 호출을 한 번의 generate로 묶음
+LLM_BATCH_WINDOW_MS = float(os.environ.get("LLM_BATCH_WINDOW_MS", "10"))
+LLM_MAX_BATCH = int(os.environ.get("LLM_MAX_BATCH", "8"))
 PRICE_TOLERANCE = 1.15
+
+# 🔹 업로드 이미지 임시 저장 위치 (기본: RAM 기반 tmpfs, 없으면 프로젝트 폴더)
+_SHM_DIR = Path("/dev/shm")
+UPLOAD_TMP_DIR = Path(
+    os.environ.get("MOOD_TMP_DIR")
+    or (_SHM_DIR / "mood_uploads" if _SHM_DIR.is_dir() else BASE_DIR / "tmp_uploads")
+)
+
+# 🔹 /chat/text 의미 기반 응답 캐시 (같은 상태 + 거의 같은 문장이면 LLM 생략)
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "1") != "0"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL = 3600
+SEMANTIC_CACHE_MAX_ENTRIES = 2048
+SEMANTIC_CACHE_MAX_BYTES = 128 * 1024 * 1024
+# 캐시 조회용 문장 임베딩 타임아웃(초). 넘기면 재시도 없이 캐시 없이 진행
+SEMANTIC_CACHE_EMBED_TIMEOUT = float(os.environ.get("SEMANTIC_CACHE_EMBED_TIMEOUT", "2"))
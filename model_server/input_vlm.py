@@ -33,7 +33,8 @@ from transformers import AutoProcessor
 from transformers import Qwen2_5_VLForConditionalGeneration
 from qwen_vl_utils import process_vision_info
 
-from config import VLM_MODEL_NAME  # 예: "Qwen/Qwen2.5-VL-7B-Instruct"
+from config import VLM_MODEL_NAME, VLM_CACHE_TTL  # 예: "Qwen/Qwen2.5-VL-7B-Instruct"
+from result_cache import DiskCache, make_key
 
 # 🔹 추가: 품질 검사용
 import numpy as np
@@ -501,6 +502,9 @@ class QwenVLClient:
 # 싱글톤 형태로 재사용 (Streamlit / CLI 양쪽에서 공용으로 쓰기 편하게)
 _vlm_client: Optional[QwenVLClient] = None
 
+# VLM 분석 결과 디스크 캐시 (이미지 sha256 기준)
+_vlm_cache = DiskCache("vlm", default_ttl=VLM_CACHE_TTL)
+
 
 def get_vlm_client() -> QwenVLClient:
     global _vlm_client
@@ -520,14 +524,30 @@ def analyze_room_image(
         from input_vlm import analyze_room_image
         result = analyze_room_image("examples/room.jpg", "원목가구 위주, 따뜻한 분위기 좋아함")
     """
+    # 같은 이미지(바이트 기준) + 같은 힌트면 디스크 캐시에서 바로 반환
+    path = Path(image_path)
+    cache_key = None
+    if path.is_file():
+        cache_key = make_key(VLM_MODEL_NAME, path.read_bytes(), user_hint or "")
+        cached = _vlm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     client = get_vlm_client()
-    return client.analyze_image(image_path, user_hint=user_hint)
+    result = client.analyze_image(image_path, user_hint=user_hint)
+
+    if cache_key is not None:
+        _vlm_cache.set(cache_key, result)
+    return result
 
 
 # ============================================================
 #  VLM 결과를 세션 상태에 바로 쓰기 좋은 형태로 가공하는 헬퍼
 # ============================================================
 
+_LIST_SPLIT_RE = re.compile(r"[,\n/]")
+
+
 def _normalize_str_list(val: Any) -> List[str]:
     """
     문자열 / 리스트 / 튜플 형태로 올 수 있는 키워드를
@@ -535,8 +555,7 @@ def _normalize_str_list(val: Any) -> List[str]:
     """
     if isinstance(val, str):
         # 쉼표/슬래시/줄바꿈 기준으로 자르기
-        chunks = re.split(r"[,\n/]", val)
-        return [c.strip() for c in chunks if c.strip()]
+        return list(filter(None, map(str.strip, _LIST_SPLIT_RE.split(val))))
     elif isinstance(val, (list, tuple)):
         return [str(x).strip() for x in val if str(x).strip()]
     else:
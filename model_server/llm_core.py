@@ -1,14 +1,17 @@
 # llm_core.py
 """
-Qwen2.5-14B-Korean 기반 LLM 모듈 (8bit 양자화 로딩)
+Qwen2.5-14B-Korean 기반 LLM 모듈 (4bit NF4 / 8bit 양자화 로딩)
 
 - 일반 대화 / 추천 생성: chat_template.jinja 활용 (use_chat_template=True)
 - JSON 파싱(parse_user_query): 템플릿 안 쓰고 단순 텍스트 프롬프트로만 호출 (use_chat_template=False)
 """
 
+import copy
 import json
 import re
+import threading
 import time
+from functools import lru_cache, wraps
 from typing import Optional, List, Dict, Any, Tuple
 
 import torch
@@ -16,11 +19,19 @@ from transformers import (
     AutoTokenizer,
     AutoModelForCausalLM,
     BitsAndBytesConfig,
+    DynamicCache,
 )
 from transformers.utils import logging as hf_logging
 
-from config import HF_QWEN_MODEL_NAME
+from config import (
+    HF_QWEN_MODEL_NAME,
+    LLM_BATCH_WINDOW_MS,
+    LLM_MAX_BATCH,
+    LLM_QUANTIZATION,
+    PARSE_CACHE_TTL,
+)
 from mood_vocab import snap_moods_to_vocab, match_moods_in_text  # 텍스트에서 무드 탐지
+from result_cache import DiskCache, make_key
 
 
 # =========================
@@ -44,19 +55,38 @@ DEFAULT_SYSTEM_PROMPT = (
 )
 
 
+# 가격 문자열에서 콤마/공백을 한 번에 제거하기 위한 변환 테이블
+_PRICE_STRIP_TABLE = str.maketrans("", "", ", ")
+
+
 # =========================
-# 2. 모델 로딩 (8bit)
+# 2. 모델 로딩 (4bit NF4 기본, LLM_QUANTIZATION=int8 이면 8bit)
 # =========================
 
 hf_logging.set_verbosity_error()
 
-print(f"[LLM] ▶ Qwen2.5-14B-Korean (8bit, device_map='auto') 로딩 중...")
+# 오타("nf8", "bf16" 등)가 조용히 NF4로 로딩되지 않도록 알 수 없는 값은 거부
+if LLM_QUANTIZATION not in ("nf4", "int8"):
+    raise ValueError(
+        f"LLM_QUANTIZATION은 'nf4' 또는 'int8'만 지원합니다 (현재: {LLM_QUANTIZATION!r})"
+    )
 
-bnb_config = BitsAndBytesConfig(
-    load_in_8bit=True,
-    llm_int8_threshold=6.0,
-    llm_int8_has_fp16_weight=False,
-)
+if LLM_QUANTIZATION == "int8":
+    print(f"[LLM] ▶ Qwen2.5-14B-Korean (8bit, device_map='auto') 로딩 중...")
+    bnb_config = BitsAndBytesConfig(
+        load_in_8bit=True,
+        llm_int8_threshold=6.0,
+        llm_int8_has_fp16_weight=False,
+    )
+else:
+    # 디코딩은 가중치 메모리 대역폭에 묶여 있으므로 4bit로 읽는 바이트 수를 줄인다.
+    print(f"[LLM] ▶ Qwen2.5-14B-Korean (4bit NF4, device_map='auto') 로딩 중...")
+    bnb_config = BitsAndBytesConfig(
+        load_in_4bit=True,
+        bnb_4bit_quant_type="nf4",
+        bnb_4bit_compute_dtype=torch.bfloat16,
+        bnb_4bit_use_double_quant=True,
+    )
 
 tokenizer = AutoTokenizer.from_pretrained(
     HF_QWEN_MODEL_NAME,
@@ -125,39 +155,292 @@ def clean_trailing_incomplete_sentence(text: str) -> str:
     return cleaned
 
 
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _extract_json_object(raw: str) -> Dict[str, Any]:
+    """
+    LLM 출력에서 첫 번째 JSON 객체만 파싱한다.
+
+    '{'가 나오는 위치부터 raw_decode로 앞에서부터 한 번에 파싱하므로
+    뒤에 쓰레기 텍스트가 붙어 있어도 정규식 백트래킹 없이 처리된다.
+    """
+    start = raw.find("{")
+    while start != -1:
+        try:
+            obj, _ = _JSON_DECODER.raw_decode(raw, start)
+        except json.JSONDecodeError:
+            start = raw.find("{", start + 1)
+            continue
+        return obj if isinstance(obj, dict) else {}
+    return {}
+
+
 # =========================
 # 4. 입력 빌더
 # =========================
 
+@lru_cache(maxsize=64)
+def _encode_system_segment(system_prompt: str) -> Tuple[str, torch.Tensor]:
+    """
+    chat_template으로 렌더링한 system 메시지 부분의 (텍스트, 토큰 id)를 캐시.
+
+    SMALLTALK / 추천처럼 system 프롬프트가 고정인 경우 매 턴 다시 토크나이즈하지 않는다.
+    """
+    text = tokenizer.apply_chat_template(
+        [{"role": "system", "content": system_prompt}],
+        tokenize=False,
+        add_generation_prompt=False,
+    )
+    ids = tokenizer(text, add_special_tokens=False, return_tensors="pt")["input_ids"]
+    return text, ids
+
+
 def _build_inputs_with_template(messages: List[Dict[str, str]]):
     """Qwen chat_template.jinja 를 사용한 입력 생성 (일반 대화용)."""
-    input_ids = tokenizer.apply_chat_template(
+    full_text = tokenizer.apply_chat_template(
         messages,
-        tokenize=True,
+        tokenize=False,
         add_generation_prompt=True,
-        return_tensors="pt",
     )
+
+    # system 부분은 캐시된 토큰을 쓰고, 나머지(히스토리 + 이번 입력)만 토크나이즈
+    if messages and messages[0].get("role") == "system":
+        sys_text, sys_ids = _encode_system_segment(messages[0]["content"])
+        if full_text.startswith(sys_text):
+            rest_ids = tokenizer(
+                full_text[len(sys_text):],
+                add_special_tokens=False,
+                return_tensors="pt",
+            )["input_ids"]
+            return {"input_ids": torch.cat([sys_ids, rest_ids], dim=1)}
+
+    input_ids = tokenizer(full_text, add_special_tokens=False, return_tensors="pt")["input_ids"]
     return {"input_ids": input_ids}
 
 
+def _fallback_prefix(system_prompt: str) -> str:
+    return f"[SYSTEM]\n{system_prompt}\n\n"
+
+
+def _fallback_suffix(user_text: str) -> str:
+    return f"[USER]\n{user_text}\n\n[ASSISTANT]\n"
+
+
 def _build_inputs_fallback(system_prompt: str, user_text: str):
     """
     chat_template 없이 단순 텍스트 프롬프트로 입력 생성
     (parse_user_query용: 버그 회피용)
     """
-    text = (
-        f"[SYSTEM]\n{system_prompt}\n\n"
-        f"[USER]\n{user_text}\n\n"
-        "[ASSISTANT]\n"
-    )
+    text = _fallback_prefix(system_prompt) + _fallback_suffix(user_text)
     enc = tokenizer(text, return_tensors="pt")
     return {"input_ids": enc["input_ids"]}
 
 
+# 프롬프트 앞부분 텍스트 → (prefix input_ids, prefix KV cache)
+_prefix_kv_cache: Dict[str, Tuple[torch.Tensor, DynamicCache]] = {}
+_prefix_kv_lock = threading.Lock()
+
+
+def _get_prefix_kv(
+    prefix_text: str,
+    add_special_tokens: bool = True,
+) -> Tuple[torch.Tensor, DynamicCache]:
+    """
+    매번 같은 프롬프트 앞부분을 한 번만 토크나이즈 + prefill 해서
+    KV 캐시를 메모리에 상주시킨다.
+    (파서의 system 프롬프트, SURVEY system 프롬프트의 고정 앞부분 등)
+    """
+    hit = _prefix_kv_cache.get(prefix_text)
+    if hit is not None:
+        return hit
+
+    with _prefix_kv_lock:
+        hit = _prefix_kv_cache.get(prefix_text)
+        if hit is None:
+            main_device = next(model.parameters()).device
+            prefix_ids = tokenizer(
+                prefix_text,
+                add_special_tokens=add_special_tokens,
+                return_tensors="pt",
+            )["input_ids"].to(main_device)
+
+            prefix_cache = DynamicCache()
+            with _generate_lock, torch.no_grad():
+                model(input_ids=prefix_ids, past_key_values=prefix_cache, use_cache=True)
+
+            hit = (prefix_ids, prefix_cache)
+            _prefix_kv_cache[prefix_text] = hit
+    return hit
+
+
+def _build_inputs_fallback_cached(system_prompt: str, user_text: str):
+    """
+    _build_inputs_fallback과 같은 포맷이지만, system 프롬프트 부분은
+    미리 계산해 둔 KV 캐시를 재사용한다. (사용자 입력 부분만 새로 prefill)
+    """
+    prefix_ids, prefix_cache = _get_prefix_kv(_fallback_prefix(system_prompt))
+    suffix_ids = tokenizer(
+        _fallback_suffix(user_text),
+        add_special_tokens=False,
+        return_tensors="pt",
+    )["input_ids"].to(prefix_ids.device)
+
+    input_ids = torch.cat([prefix_ids, suffix_ids], dim=1)
+    # generate()가 캐시를 제자리에서 늘리므로 호출마다 복사본을 넘긴다.
+    return {"input_ids": input_ids}, copy.deepcopy(prefix_cache)
+
+
+def _build_inputs_with_template_cached(messages: List[Dict[str, str]], static_prefix: str):
+    """
+    _build_inputs_with_template과 같은 입력을 만들되, system 프롬프트의
+    고정 앞부분(static_prefix)까지는 미리 계산해 둔 KV 캐시를 재사용한다.
+    (SURVEY처럼 system 프롬프트 뒷부분만 턴마다 바뀌는 경우용)
+    """
+    full_text = tokenizer.apply_chat_template(
+        messages,
+        tokenize=False,
+        add_generation_prompt=True,
+    )
+
+    cut = full_text.find(static_prefix)
+    if cut == -1:
+        return _build_inputs_with_template(messages), None
+
+    head = full_text[:cut + len(static_prefix)]
+    prefix_ids, prefix_cache = _get_prefix_kv(head, add_special_tokens=False)
+    rest_ids = tokenizer(
+        full_text[len(head):],
+        add_special_tokens=False,
+        return_tensors="pt",
+    )["input_ids"].to(prefix_ids.device)
+
+    input_ids = torch.cat([prefix_ids, rest_ids], dim=1)
+    return {"input_ids": input_ids}, copy.deepcopy(prefix_cache)
+
+
+# =========================
+# 4-1. generate 마이크로 배칭
+# =========================
+
+# GPU 위의 LLM은 하나뿐이므로 generate 호출은 항상 한 번에 하나만
+_generate_lock = threading.Lock()
+
+
+class _BatchRequest:
+    __slots__ = ("input_ids", "done", "result", "error")
+
+    def __init__(self, input_ids: torch.Tensor):
+        self.input_ids = input_ids
+        self.done = threading.Event()
+        self.result: Optional[torch.Tensor] = None
+        self.error: Optional[BaseException] = None
+
+
+class _GenerateBatcher:
+    """
+    여러 스레드에서 거의 동시에 들어온 generate 요청(같은 생성 옵션)을 모아서
+    왼쪽 패딩 후 한 번의 model.generate로 처리한다.
+
+    - 그룹의 첫 요청(리더)이 window 동안 기다리며 같은 옵션의 요청을 모은다.
+    - 나머지 요청은 리더가 결과를 채워 줄 때까지 대기한다.
+    - 다른 chat() 호출이 진행 중이 아니거나 max_batch == 1이면 기다리지 않고
+      기존과 똑같이 단건 generate (혼자 온 요청이 window를 기다리지 않도록).
+    """
+
+    def __init__(self, window_sec: float, max_batch: int):
+        self.window_sec = window_sec
+        self.max_batch = max(1, max_batch)
+        self._lock = threading.Lock()
+        self._pending: Dict[tuple, List[_BatchRequest]] = {}
+        self._inflight = 0  # 현재 진행 중인 chat() 호출 수 (prefill 단계 포함)
+
+    def enter(self) -> None:
+        with self._lock:
+            self._inflight += 1
+
+    def exit(self) -> None:
+        with self._lock:
+            self._inflight -= 1
+
+    def generate(self, input_ids: torch.Tensor, gen_kwargs: Dict[str, Any]) -> torch.Tensor:
+        """input_ids: (1, L) → 새로 생성된 토큰 id (1차원)."""
+        key = tuple(sorted(gen_kwargs.items()))
+        req = _BatchRequest(input_ids)
+
+        with self._lock:
+            bucket = self._pending.setdefault(key, [])
+            bucket.append(req)
+            is_leader = len(bucket) == 1
+            # 같이 묶일 수 있는 다른 호출이 있을 때만 window 동안 기다린다.
+            should_wait = self.max_batch > 1 and self._inflight > len(bucket)
+
+        if is_leader:
+            if self.window_sec > 0 and should_wait:
+                time.sleep(self.window_sec)
+            with self._lock:
+                batch = self._pending.pop(key)
+            for i in range(0, len(batch), self.max_batch):
+                self._run(batch[i : i + self.max_batch], gen_kwargs)
+        else:
+            req.done.wait()
+
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def _run(self, batch: List[_BatchRequest], gen_kwargs: Dict[str, Any]) -> None:
+        try:
+            pad_id = gen_kwargs.get("pad_token_id", tokenizer.eos_token_id)
+            max_len = max(r.input_ids.shape[1] for r in batch)
+            device = batch[0].input_ids.device
+
+            input_ids = torch.full((len(batch), max_len), pad_id, dtype=torch.long, device=device)
+            attention_mask = torch.zeros((len(batch), max_len), dtype=torch.long, device=device)
+            for row, r in enumerate(batch):
+                n = r.input_ids.shape[1]
+                input_ids[row, max_len - n:] = r.input_ids[0]
+                attention_mask[row, max_len - n:] = 1
+
+            with _generate_lock, torch.no_grad():
+                outputs = model.generate(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    **gen_kwargs,
+                )
+
+            for row, r in enumerate(batch):
+                r.result = outputs[row][max_len:]
+        except BaseException as e:
+            for r in batch:
+                r.error = e
+        finally:
+            for r in batch:
+                r.done.set()
+
+
+_batcher = _GenerateBatcher(LLM_BATCH_WINDOW_MS / 1000.0, LLM_MAX_BATCH)
+
+
+def _track_inflight(func):
+    """chat() 진행 중 개수를 배처에 알려서, 혼자 온 요청은 배칭 대기를 건너뛰게 한다."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        _batcher.enter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _batcher.exit()
+
+    return wrapper
+
+
 # =========================
 # 5. 공통 chat 함수
 # =========================
 
+@_track_inflight
 def chat(
     history: List[Tuple[str, str]],
     user_input: str,
@@ -167,6 +450,8 @@ def chat(
     top_p: float = 0.9,
     do_sample: bool = True,
     use_chat_template: bool = True,
+    cache_system_prefix: bool = False,
+    static_prefix: Optional[str] = None,
 ) -> str:
     """
     history: [(user, assistant), ...]
@@ -174,6 +459,11 @@ def chat(
 
     - use_chat_template=True  → Qwen chat_template 사용 (일반 대화/추천)
     - use_chat_template=False → fallback 텍스트 포맷 사용 (파서)
+    - cache_system_prefix=True (fallback 포맷 전용)
+        → system 프롬프트의 KV 캐시를 재사용해서 사용자 입력 부분만 prefill
+    - static_prefix (chat_template 전용)
+        → system_prompt 중 턴마다 바뀌지 않는 앞부분. 이 부분의 KV 캐시를 재사용하고
+          나머지(동적 system 내용 + 히스토리 + 이번 입력)만 prefill
 
     ⚠️ 주의:
     - main.py에서 추천 모드(handle_recommend)는 system_prompt로 DEFAULT_SYSTEM_PROMPT를 넘긴다.
@@ -190,6 +480,7 @@ def chat(
         effective_temperature = min(float(temperature), 0.5)
         effective_top_p = min(float(top_p), 0.85)
 
+    past_key_values = None
     if use_chat_template:
         messages: List[Dict[str, str]] = []
         messages.append({"role": "system", "content": system_prompt})
@@ -199,7 +490,12 @@ def chat(
             messages.append({"role": "assistant", "content": a})
 
         messages.append({"role": "user", "content": user_input})
-        inputs = _build_inputs_with_template(messages)
+        if static_prefix:
+            inputs, past_key_values = _build_inputs_with_template_cached(messages, static_prefix)
+        else:
+            inputs = _build_inputs_with_template(messages)
+    elif cache_system_prefix:
+        inputs, past_key_values = _build_inputs_fallback_cached(system_prompt, user_input)
     else:
         inputs = _build_inputs_fallback(system_prompt, user_input)
 
@@ -224,19 +520,25 @@ def chat(
     else:
         gen_kwargs.update(do_sample=False)
 
+    if past_key_values is not None:
+        gen_kwargs.update(past_key_values=past_key_values)
+
     t0 = time.time()
-    with torch.no_grad():
-        outputs = model.generate(
-            input_ids=input_ids,
-            attention_mask=attention_mask,
-            **gen_kwargs,
-        )
+    if past_key_values is not None:
+        # 프롬프트 앞부분 KV 캐시를 쓰는 호출은 요청마다 캐시가 달라 배칭하지 않는다.
+        with _generate_lock, torch.no_grad():
+            outputs = model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                **gen_kwargs,
+            )
+        generated_ids = outputs[0][input_ids.shape[1]:]
+    else:
+        # 동시에 들어온 같은 옵션의 호출과 한 번의 generate로 묶어서 처리
+        generated_ids = _batcher.generate(input_ids, gen_kwargs)
     t1 = time.time()
     _elapsed = t1 - t0  # 내부에서는 로그만 제거, 값은 필요하면 디버그용으로 남겨둘 수 있음
 
-    input_len = input_ids.shape[1]
-    generated_ids = outputs[0][input_len:]
-
     text = tokenizer.decode(generated_ids, skip_special_tokens=True)
     text = text.strip()
     text = clean_trailing_incomplete_sentence(text)
@@ -249,6 +551,93 @@ def chat(
 # 6. 사용자 질의 파싱 (카테고리/무드/예산/공간)
 # =========================
 
+# 파서용 system 프롬프트 (고정 문자열 → KV 캐시 재사용 대상)
+PARSE_SYSTEM_PROMPT = (
+    "너는 인테리어 상품 추천 시스템의 파서(parser)이다. "
+    "사용자의 한국어 문장을 읽고 다음 정보를 JSON 형식으로만 추출해라.\n\n"
+    '필드 설명:\n'
+    '  - "category": 사용자가 원하는 주요 카테고리 (예: "러그", "커튼", "조명", "수납장"). 없으면 null.\n'
+    '  - "price_min": 예산의 최소값 (원 단위 정수). 없으면 null.\n'
+    '  - "price_max": 예산의 최대값 (원 단위 정수). 없으면 null.\n'
+    '  - "moods": 사용자가 원하는 무드/분위기를 나타내는 한국어 단어 리스트.\n'
+    '  - "space": 사용자가 꾸미고 싶다고 말한 주요 공간. 예: "책상 근처", "침실", "거실", "작업실" 등.\n\n'
+    "중요 규칙:\n"
+    "1) 무드(moods)에는 분위기/스타일을 나타내는 표현만 넣어라.\n"
+    "2) '책상 근처', '침실', '거실' 같은 공간 표현은 space에만 넣고 moods에는 넣지 마라.\n"
+    "3) 예산이 전혀 언급되지 않으면 price_min, price_max는 모두 null로 둔다.\n"
+    "4) JSON 이외의 글자는 절대 출력하지 마라."
+)
+
+# LLM 1차 파싱(JSON) 결과 캐시: 휴리스틱 보정은 매번 다시 적용한다.
+_parse_cache = DiskCache("parse", default_ttl=PARSE_CACHE_TTL)
+
+# ---------- 휴리스틱용 고정 테이블 (호출마다 새로 만들지 않도록 모듈 레벨에 둔다) ----------
+
+_MOOD_PATTERNS: Tuple[Tuple[str, str], ...] = (
+    ("차분", "차분한"),
+    ("잔잔", "차분한"),
+    ("따뜻", "따뜻한"),
+    ("포근", "포근한"),
+    ("아늑", "아늑한"),
+    ("편안", "편안한"),
+    ("모던", "모던"),
+    ("현대적", "모던"),
+    ("심플", "미니멀"),
+    ("미니멀", "미니멀"),
+    ("북유럽", "북유럽풍"),
+    ("호텔", "호텔식"),
+    ("우드톤", "우드톤"),
+    ("화이트톤", "화이트톤"),
+)
+
+_BUDGET_RANGE2_RE = re.compile(
+    r"(\d+)\s*만\s*원?\s*(?:이상|초과|부터)[^0-9]{0,15}(\d+)\s*만\s*원?\s*(?:이하|이내|까지|언더|아래|밑)"
+)
+_BUDGET_RANGE_RE = re.compile(r"(\d+)\s*만\s*원?\s*(?:에서|~|-)\s*(\d+)\s*만")
+_BUDGET_AROUND_RE = re.compile(r"(\d+)\s*만\s*원?\s*(?:정도|쯤|전후|근처|근방|언저리)")
+_BUDGET_AMOUNT_RE = re.compile(r"(\d+)\s*만\s*원?")
+
+_BUDGET_CAP_WORDS = ("이내", "이하", "까지", "최대", "언더", "아래", "밑")
+_BUDGET_LOW_WORDS = ("이상", "부터", "넘게", "초과", "오버", "위")
+_BUDGET_AROUND_WORDS = ("정도", "쯤", "전후", "근처", "근방", "언저리")
+
+_INTERIOR_WORDS = (
+    "인테리어", "집 꾸미", "집꾸미",
+    "공간", "방", "거실", "침실", "작업실", "서재",
+    "가구", "소품", "쿠션", "러그", "조명", "커튼",
+)
+
+# (키워드들, 카테고리) – 위에서부터 순서대로 검사
+_CATEGORY_KEYWORDS: Tuple[Tuple[Tuple[str, ...], str], ...] = (
+    (("조명", "램프", "무드등", "스탠드", "벽걸이조명", "벽등", "백열등"), "조명"),
+    (("러그", "카페트", "카펫", "카펫트"), "러그_커튼"),
+    (("커튼", "블라인드"), "러그_커튼"),
+    (("쿠션", "쿠션커버", "방석"), "쿠션"),
+    (("이불", "침구", "베딩", "이불커버", "침대커버"), "침구"),
+    (("선반", "수납", "서랍", "책장", "수납장"), "수납정리"),
+)
+
+# LLM이 영어로 준 카테고리 → DB category_id (읽기 전용으로만 사용)
+_CATEGORY_MAP: Dict[str, str] = {
+    "lighting": "조명",
+    "light": "조명",
+    "lamp": "조명",
+    "rug": "러그_커튼",
+    "curtain": "러그_커튼",
+    "carpet": "러그_커튼",
+    "bedding": "침구",
+    "blanket": "침구",
+    "duvet": "침구",
+    "pillow": "쿠션",
+    "cushion": "쿠션",
+    "storage": "수납정리",
+    "shelf": "수납정리",
+}
+
+# 무드로 쓰면 안 되는 단어들 (사진은 이미지를 가리키는 말일 뿐)
+_BAD_MOOD_TOKENS = frozenset({"소품", "사진", "사진같은", "사진 같은", "이미지", "그림"})
+
+
 def parse_user_query(user_text: str) -> Dict[str, Any]:
     """
     Qwen에게 한 번 물어서:
@@ -278,24 +667,7 @@ def parse_user_query(user_text: str) -> Dict[str, Any]:
     def _heuristic_detect_moods(text: str) -> List[str]:
         candidates: List[str] = []
 
-        mood_patterns = [
-            ("차분", "차분한"),
-            ("잔잔", "차분한"),
-            ("따뜻", "따뜻한"),
-            ("포근", "포근한"),
-            ("아늑", "아늑한"),
-            ("편안", "편안한"),
-            ("모던", "모던"),
-            ("현대적", "모던"),
-            ("심플", "미니멀"),
-            ("미니멀", "미니멀"),
-            ("북유럽", "북유럽풍"),
-            ("호텔", "호텔식"),
-            ("우드톤", "우드톤"),
-            ("화이트톤", "화이트톤"),
-        ]
-
-        for key, label in mood_patterns:
+        for key, label in _MOOD_PATTERNS:
             if key in text:
                 candidates.append(label)
 
@@ -305,28 +677,24 @@ def parse_user_query(user_text: str) -> Dict[str, Any]:
         """
         예산 관련 휴리스틱 파서.
         """
-        m_range2 = re.search(
-            r"(\d+)\s*만\s*원?\s*(?:이상|초과|부터)[^0-9]{0,15}(\d+)\s*만\s*원?\s*(?:이하|이내|까지|언더|아래|밑)",
-            text,
-        )
+        # 모든 패턴이 'N만'을 요구하므로, '만'이 없으면 정규식을 돌릴 필요가 없다.
+        # (긴 붙여넣기 텍스트에서도 C 레벨 부분 문자열 검사 한 번으로 끝남)
+        if "만" not in text:
+            return (None, None)
+
+        m_range2 = _BUDGET_RANGE2_RE.search(text)
         if m_range2:
             a = int(m_range2.group(1)) * 10000
             b = int(m_range2.group(2)) * 10000
             return (min(a, b), max(a, b))
 
-        m_range = re.search(
-            r"(\d+)\s*만\s*원?\s*(?:에서|~|-)\s*(\d+)\s*만",
-            text,
-        )
+        m_range = _BUDGET_RANGE_RE.search(text)
         if m_range:
             a = int(m_range.group(1)) * 10000
             b = int(m_range.group(2)) * 10000
             return (min(a, b), max(a, b))
 
-        m_around_num = re.search(
-            r"(\d+)\s*만\s*원?\s*(?:정도|쯤|전후|근처|근방|언저리)",
-            text,
-        )
+        m_around_num = _BUDGET_AROUND_RE.search(text)
         if m_around_num:
             v = int(m_around_num.group(1)) * 10000
             lo = int(v * 0.8)
@@ -335,22 +703,18 @@ def parse_user_query(user_text: str) -> Dict[str, Any]:
 
         matches = [
             (int(m.group(1)) * 10000, m.start())
-            for m in re.finditer(r"(\d+)\s*만\s*원?", text)
+            for m in _BUDGET_AMOUNT_RE.finditer(text)
         ]
         if not matches:
             return (None, None)
 
-        cap_words = ["이내", "이하", "까지", "최대", "언더", "아래", "밑"]
-        low_words = ["이상", "부터", "넘게", "초과", "오버", "위"]
-        around_words = ["정도", "쯤", "전후", "근처", "근방", "언저리"]
-
-        def first_pos(words: List[str]) -> int:
+        def first_pos(words: Tuple[str, ...]) -> int:
             poss = [text.find(w) for w in words if w in text]
             return min(poss) if poss else -1
 
-        cap_pos = first_pos(cap_words)
-        low_pos = first_pos(low_words)
-        around_pos = first_pos(around_words)
+        cap_pos = first_pos(_BUDGET_CAP_WORDS)
+        low_pos = first_pos(_BUDGET_LOW_WORDS)
+        around_pos = first_pos(_BUDGET_AROUND_WORDS)
 
         def pick_before(pos: int) -> int:
             if pos == -1:
@@ -377,28 +741,14 @@ def parse_user_query(user_text: str) -> Dict[str, Any]:
         return (lo, hi)
 
     def _looks_like_interior_context(text: str) -> bool:
-        interior_words = [
-            "인테리어", "집 꾸미", "집꾸미",
-            "공간", "방", "거실", "침실", "작업실", "서재",
-            "가구", "소품", "쿠션", "러그", "조명", "커튼",
-        ]
-        return any(w in text for w in interior_words)
+        return any(w in text for w in _INTERIOR_WORDS)
 
     def _heuristic_detect_category(text: str) -> Optional[str]:
         t = text.replace(" ", "").lower()
 
-        if any(k in t for k in ["조명", "램프", "무드등", "스탠드", "벽걸이조명", "벽등", "백열등"]):
-            return "조명"
-        if any(k in t for k in ["러그", "카페트", "카펫", "카펫트"]):
-            return "러그_커튼"
-        if any(k in t for k in ["커튼", "블라인드"]):
-            return "러그_커튼"
-        if any(k in t for k in ["쿠션", "쿠션커버", "방석"]):
-            return "쿠션"
-        if any(k in t for k in ["이불", "침구", "베딩", "이불커버", "침대커버"]):
-            return "침구"
-        if any(k in t for k in ["선반", "수납", "서랍", "책장", "수납장"]):
-            return "수납정리"
+        for keywords, label in _CATEGORY_KEYWORDS:
+            if any(k in t for k in keywords):
+                return label
         return None
 
     def _normalize_category_str(cat: Optional[str]) -> Optional[str]:
@@ -406,24 +756,8 @@ def parse_user_query(user_text: str) -> Dict[str, Any]:
             return None
         s = str(cat).strip().lower()
 
-        mapping = {
-            "lighting": "조명",
-            "light": "조명",
-            "lamp": "조명",
-            "rug": "러그_커튼",
-            "curtain": "러그_커튼",
-            "carpet": "러그_커튼",
-            "bedding": "침구",
-            "blanket": "침구",
-            "duvet": "침구",
-            "pillow": "쿠션",
-            "cushion": "쿠션",
-            "storage": "수납정리",
-            "shelf": "수납정리",
-        }
-
-        if s in mapping:
-            return mapping[s]
+        if s in _CATEGORY_MAP:
+            return _CATEGORY_MAP[s]
 
         if re.search(r"[가-힣]", s):
             return s
@@ -431,49 +765,35 @@ def parse_user_query(user_text: str) -> Dict[str, Any]:
 
     # ---------- 1) LLM 기반 1차 파싱 ----------
 
-    parse_system_prompt = (
-        "너는 인테리어 상품 추천 시스템의 파서(parser)이다. "
-        "사용자의 한국어 문장을 읽고 다음 정보를 JSON 형식으로만 추출해라.\n\n"
-        '필드 설명:\n'
-        '  - "category": 사용자가 원하는 주요 카테고리 (예: "러그", "커튼", "조명", "수납장"). 없으면 null.\n'
-        '  - "price_min": 예산의 최소값 (원 단위 정수). 없으면 null.\n'
-        '  - "price_max": 예산의 최대값 (원 단위 정수). 없으면 null.\n'
-        '  - "moods": 사용자가 원하는 무드/분위기를 나타내는 한국어 단어 리스트.\n'
-        '  - "space": 사용자가 꾸미고 싶다고 말한 주요 공간. 예: "책상 근처", "침실", "거실", "작업실" 등.\n\n'
-        "중요 규칙:\n"
-        "1) 무드(moods)에는 분위기/스타일을 나타내는 표현만 넣어라.\n"
-        "2) '책상 근처', '침실', '거실' 같은 공간 표현은 space에만 넣고 moods에는 넣지 마라.\n"
-        "3) 예산이 전혀 언급되지 않으면 price_min, price_max는 모두 null로 둔다.\n"
-        "4) JSON 이외의 글자는 절대 출력하지 마라."
-    )
-
     parse_user_prompt = (
         f"사용자 입력: {user_text}\n\n"
         "위 설명대로 JSON만 출력해."
     )
 
-    raw = chat(
-        history=[],
-        user_input=parse_user_prompt,
-        system_prompt=parse_system_prompt,
-        max_new_tokens=256,
-        temperature=0.0,
-        top_p=1.0,
-        do_sample=False,
-        use_chat_template=False,
+    # greedy 디코딩이라 같은 프롬프트면 결과도 같다 → 디스크 캐시 우선 조회
+    # (양자화 방식이 다르면 출력이 달라질 수 있으므로 키에 포함)
+    cache_key = make_key(
+        HF_QWEN_MODEL_NAME, LLM_QUANTIZATION, PARSE_SYSTEM_PROMPT, parse_user_prompt
     )
+    data = _parse_cache.get(cache_key)
+
+    if data is None:
+        raw = chat(
+            history=[],
+            user_input=parse_user_prompt,
+            system_prompt=PARSE_SYSTEM_PROMPT,
+            max_new_tokens=256,
+            temperature=0.0,
+            top_p=1.0,
+            do_sample=False,
+            use_chat_template=False,
+            cache_system_prefix=True,
+        )
 
-    # ---------- 2) JSON 부분만 추출 ----------
+        # ---------- 2) JSON 부분만 추출 ----------
 
-    match = re.search(r"\{.*\}", raw, re.DOTALL)
-    if not match:
-        data = {}
-    else:
-        json_str = match.group(0)
-        try:
-            data = json.loads(json_str)
-        except Exception:
-            data = {}
+        data = _extract_json_object(raw)
+        _parse_cache.set(cache_key, data)
 
     # ---------- 3) 1차 추출 값 ----------
 
@@ -495,9 +815,11 @@ def parse_user_query(user_text: str) -> Dict[str, Any]:
     def _to_int_or_none(x):
         if x is None:
             return None
+        if type(x) is int:
+            return x
         if isinstance(x, (int, float)):
             return int(x)
-        s = str(x).replace(",", "").replace(" ", "")
+        s = str(x).translate(_PRICE_STRIP_TABLE)
         if s.isdigit():
             return int(s)
         return None
@@ -541,12 +863,9 @@ def parse_user_query(user_text: str) -> Dict[str, Any]:
 
     canonical_moods, unknown_moods = snap_moods_to_vocab(moods)
 
-    # 🔹 무드로 쓰면 안 되는 단어들 정리 (사진은 이미지를 가리키는 말일 뿐)
-    BAD_MOOD_TOKENS = {"소품", "사진", "사진같은", "사진 같은", "이미지", "그림"}
-
-    # 🔹 canonical 무드만 진짜 moods로 인정 + BAD_MOOD_TOKENS 제거
-    moods = [m for m in canonical_moods if m not in BAD_MOOD_TOKENS]
-    unknown_moods = [m for m in unknown_moods if m not in BAD_MOOD_TOKENS]
+    # 🔹 canonical 무드만 진짜 moods로 인정 + 무드로 쓰면 안 되는 단어 제거
+    moods = [m for m in canonical_moods if m not in _BAD_MOOD_TOKENS]
+    unknown_moods = [m for m in unknown_moods if m not in _BAD_MOOD_TOKENS]
 
     # ---------- 8) 카테고리 보정 ----------
 
@@ -22,39 +22,70 @@ Flow:
 
 from __future__ import annotations
 
+import asyncio
+import logging
+import math
+import os
+import threading
 import time
 import re
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from enum import Enum, auto
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Tuple, Optional, Dict, Any
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
 
 from config import (
     RAG_TOP_K,
+    RAG_RERANK_ENABLED,
+    RAG_SEARCH_CACHE_TTL,
     RECOMMEND_TOP_N,
+    RECOMMEND_LLM_MIN,
+    MAX_HISTORY_TURNS,
 )
 from rag_retriever import RAGRetriever
 from product_filter import filter_and_rank
 from llm_core import chat, parse_user_query, DEFAULT_SYSTEM_PROMPT
-from mood_vocab import snap_moods_to_vocab
+from mood_vocab import snap_moods_to_vocab, mood_bits_and_extras
 from input_vlm import analyze_room_image  # VLM 모듈
 
 
+logger = logging.getLogger("moodon.chat")
+
+
 # =========================
 # 0. 유틸 함수들
 # =========================
 
+# 쉼표/줄바꿈/슬래시 구분 키워드 분리용 (1회 컴파일)
+_LIST_SPLIT_RE = re.compile(r"[,\n/]")
+
+
+# 한글/공백 이외의 문자 제거용 (1회 컴파일)
+_NON_KOREAN_RE = re.compile(r"[^가-힣\s]")
+
+
+@lru_cache(maxsize=2048)
+def _keep_korean_cached(text: str) -> str:
+    return _NON_KOREAN_RE.sub("", text).strip()
+
+
 def _keep_korean(text: str) -> str:
     """문자열에서 한글과 공백만 남기고 나머지는 제거."""
-    return re.sub(r"[^가-힣\s]", "", str(text)).strip()
+    # VLM 키워드는 턴마다 거의 같은 어휘가 반복되므로 결과를 캐시
+    return _keep_korean_cached(str(text))
 
 
 def _clean_korean_list(values: List[str]) -> List[str]:
     """문자열 리스트에서 한글/공백만 남기고 비어 있거나 중복된 항목 제거."""
     out: List[str] = []
+    seen = set()
     for v in values:
         s = _keep_korean(v)
-        if s and s not in out:
+        if s and s not in seen:
+            seen.add(s)
             out.append(s)
     return out
 
@@ -65,31 +96,38 @@ def _normalize_str_list(val: Any) -> List[str]:
     - 언어는 가리지 않고 그대로 보존 (영어도 유지).
     """
     if isinstance(val, str):
-        chunks = re.split(r"[,\n/]", val)
-        return [c.strip() for c in chunks if c.strip()]
+        return list(filter(None, map(str.strip, _LIST_SPLIT_RE.split(val))))
     elif isinstance(val, (list, tuple)):
         out: List[str] = []
+        seen = set()
         for x in val:
             s = str(x).strip()
-            if s and s not in out:
+            if s and s not in seen:
+                seen.add(s)
                 out.append(s)
         return out
     else:
         return []
 
 
+def _fmt_list(xs, default: str = "미정") -> str:
+    """리스트를 ', '로 이어 붙이고, 비어 있으면 default를 반환."""
+    return ", ".join(xs) if xs else default
+
+
 def _format_price(price_raw) -> str:
     """정수/문자/콤마 섞인 price를 '123,000원' 형태로 포맷."""
     if price_raw is None:
         return "가격 정보 없음"
-    try:
-        price = int(price_raw)
-    except Exception:
-        try:
-            price = int(str(price_raw).replace(",", "").strip())
-        except Exception:
-            return "가격 정보 없음"
-    return f"{price:,}원"
+    # 상품 루프마다 호출되므로 예외 없이 분기만으로 처리
+    if isinstance(price_raw, int):
+        return f"{price_raw:,}원"
+    if isinstance(price_raw, float):
+        return f"{int(price_raw):,}원" if math.isfinite(price_raw) else "가격 정보 없음"
+    s = str(price_raw).replace(",", "").strip()
+    if s.isdecimal():
+        return f"{int(s):,}원"
+    return "가격 정보 없음"
 
 
 # =========================
@@ -102,6 +140,12 @@ class ChatMode(Enum):
     RECOMMEND = auto()
 
 
+# 요약/파생 값(_memo)에 쓰이지 않는 필드 → 바뀌어도 _version을 올리지 않음
+# (턴마다 바뀌는 값이라 버전을 올리면 render_summary 캐시가 매 턴 무효화됨)
+_UNVERSIONED_FIELDS = frozenset({"last_user_message", "last_recommended_ids"})
+_UNSET = object()
+
+
 @dataclass
 class ChatState:
     """
@@ -147,7 +191,44 @@ class ChatState:
     # 디버그 / 내부용
     last_intent: Optional[str] = None
     last_user_message: Optional[str] = None
-    last_recommended_ids: List[str] = field(default_factory=list)
+    last_recommended_ids: FrozenSet[str] = frozenset()
+
+    # 🔸 파생 값 캐시용 버전 카운터 (필드가 바뀔 때마다 증가)
+    _version: int = field(default=0, init=False, repr=False, compare=False)
+    _derived_cache: Dict[str, Tuple[int, Any]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    # VLM 백그라운드 결과 반영 등 동시 수정 보호용
+    _lock: threading.RLock = field(
+        default_factory=threading.RLock, init=False, repr=False, compare=False
+    )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        old = self.__dict__.get(name, _UNSET)
+        object.__setattr__(self, name, value)
+        if name.startswith("_") or name in _UNVERSIONED_FIELDS:
+            return
+        # 리스트가 아닌 값(문자열/숫자/None)이 같은 값으로 다시 대입되면 버전 유지
+        # (예: SMALLTALK 턴마다 last_intent = "SMALLTALK")
+        if type(value) is not list and old is not _UNSET and old == value:
+            return
+        object.__setattr__(self, "_version", getattr(self, "_version", 0) + 1)
+
+    def touch(self) -> None:
+        """
+        리스트 필드를 제자리에서(append/clear 등) 바꾼 뒤 호출.
+        (속성 대입은 __setattr__에서 자동으로 버전이 올라감. 같은 값 재대입/_UNVERSIONED_FIELDS 제외)
+        """
+        self._version += 1
+
+    def _memo(self, name: str, compute: Callable[[], Any]) -> Any:
+        """현재 _version 기준으로 파생 값을 한 번만 계산해서 재사용."""
+        hit = self._derived_cache.get(name)
+        if hit is not None and hit[0] == self._version:
+            return hit[1]
+        value = compute()
+        self._derived_cache[name] = (self._version, value)
+        return value
 
     # 🔸 실제 추천에 사용할 "타겟 무드"
     @property
@@ -158,13 +239,73 @@ class ChatState:
         1) 사용자가 텍스트로 명시한 target_moods
         2) 사용자가 올린 '원하는 분위기' 레퍼런스 이미지의 무드(target_image_moods)
         3) 아무것도 없으면 현재 방 분위기(current_moods)를 기본 취향으로 가정
+
+        한 턴에 여러 번 읽히므로 _version 기준으로 캐시한다.
         """
+        return self._memo("effective_target_moods", self._get_effective_target_moods)
+
+    def _get_effective_target_moods(self) -> List[str]:
         if self.target_moods:
             return self.target_moods
         if self.target_image_moods:
             return self.target_image_moods
         return self.current_moods
 
+    @property
+    def target_mood_bits(self) -> Tuple[int, FrozenSet[str]]:
+        """
+        effective_target_moods의 (사전 키워드 비트마스크, 사전에 없는 표현 집합).
+        filter_and_rank의 무드 매칭 점수용. 무드가 바뀔 때만 다시 계산한다.
+        """
+        return self._memo("target_mood_bits", lambda: mood_bits_and_extras(
+            str(m).strip() for m in self.effective_target_moods if m
+        ))
+
+    # 🔸 이미지/취향 정보 존재 여부 (decide_mode / 프롬프트 빌더 공용)
+    @property
+    def has_current_image(self) -> bool:
+        """현재 방 사진이 업로드되어 있는지 (무드/설명/스타일 중 하나라도 있으면 True)."""
+        return self._memo("has_current_image", lambda: bool(
+            self.current_moods
+            or self.vlm_description
+            or self.style_keywords
+            or self.color_keywords
+            or self.material_keywords
+            or self.lighting_keywords
+        ))
+
+    @property
+    def has_ref_image(self) -> bool:
+        """레퍼런스(원하는 분위기) 이미지가 업로드되어 있는지."""
+        return self._memo("has_ref_image", lambda: bool(
+            self.target_image_moods
+            or self.target_image_description
+            or self.target_image_style_keywords
+            or self.target_image_color_keywords
+            or self.target_image_material_keywords
+            or self.target_image_lighting_keywords
+        ))
+
+    @property
+    def has_ref_image_pref(self) -> bool:
+        """레퍼런스 이미지에서 실제 취향 정보(무드/스타일/설명)를 얻었는지."""
+        return bool(
+            self.target_image_moods
+            or self.target_image_style_keywords
+            or self.target_image_description
+        )
+
+    @property
+    def has_any_pref(self) -> bool:
+        """지금까지 모아 둔 취향/공간/예산/카테고리 정보가 하나라도 있는지."""
+        return (
+            bool(self.target_moods or self.target_image_moods or self.has_ref_image_pref)
+            or self.price_min is not None
+            or self.price_max is not None
+            or bool(self.category)
+            or bool(self.space)
+        )
+
     # -------------------------
     # 업데이트 헬퍼들
     # -------------------------
@@ -201,6 +342,8 @@ class ChatState:
             if s and s not in self.unknown_target_moods:
                 self.unknown_target_moods.append(s)
 
+        self.touch()
+
     def merge(self, other: "ChatState") -> None:
         """
         다른 ChatState(예: VLM 결과)를 현재 세션에 병합.
@@ -239,6 +382,8 @@ class ChatState:
                 if v not in current:
                     current.append(v)
 
+        self.touch()
+
 
 # =========================
 # 2. 세션 전역 객체 + 대화 히스토리
@@ -250,11 +395,92 @@ session_state = ChatState()
 # (user, assistant) 튜플 리스트
 chat_history: List[Tuple[str, str]] = []
 
+# 서버 시작 시 미리 한 번씩 검색해서 임베딩/Chroma 경로를 데워 둘 대표 쿼리들
+WARMUP_QUERIES = [
+    "거실 조명 추천",
+    "침실 무드등",
+    "아늑한 거실 러그",
+    "우드톤 수납장",
+    "따뜻한 분위기 쿠션",
+    "미니멀한 침구",
+    "작업실 스탠드 조명",
+    "북유럽풍 커튼",
+]
+
+
+def _search_state_key(state: Optional[ChatState]) -> tuple:
+    """검색 결과에 영향을 줄 수 있는 state 필드만 모은 키."""
+    if state is None:
+        return ()
+    return (state.category, state.price_min, state.price_max)
+
+
+# (정규화된 쿼리, state 키) → (만료 시각, 검색 결과). 상품 데이터가 바뀌어도
+# RAG_SEARCH_CACHE_TTL이 지나면 새로 검색하도록 만료 시각을 같이 둔다.
+_SEARCH_CACHE_MAX = 512
+_search_cache: "OrderedDict[Tuple[str, tuple], Tuple[float, Tuple[Dict[str, Any], ...]]]" = OrderedDict()
+_search_cache_lock = threading.Lock()
+
+
+def _cached_search(query: str, state_key: tuple) -> Tuple[Dict[str, Any], ...]:
+    """
+    정규화된 쿼리 + state 키 기준으로 RAG 검색 결과를 캐시.
+    (SURVEY → RECOMMEND 전환처럼 같은 쿼리가 반복될 때 임베딩/ANN 생략)
+    정규화한 문자열은 캐시 키로만 쓰고, 검색에는 원래 쿼리를 그대로 넘긴다.
+    """
+    key = (" ".join(query.split()), state_key)
+    now = time.monotonic()
+    with _search_cache_lock:
+        entry = _search_cache.get(key)
+        if entry is not None and entry[0] > now:
+            _search_cache.move_to_end(key)
+            return entry[1]
+
+    category, price_min, price_max = state_key or (None, None, None)
+    search_state = ChatState(category=category, price_min=price_min, price_max=price_max)
+    results = tuple(retriever.search(query, state=search_state, top_k=RAG_TOP_K))
+
+    with _search_cache_lock:
+        _search_cache[key] = (now + RAG_SEARCH_CACHE_TTL, results)
+        _search_cache.move_to_end(key)
+        while len(_search_cache) > _SEARCH_CACHE_MAX:
+            _search_cache.popitem(last=False)
+    return results
+
+
+def search_products(query: str, state: Optional[ChatState] = None) -> List[Dict[str, Any]]:
+    """retriever.search()의 캐시 버전. 호출자가 리스트를 바꿔도 캐시는 안전하도록 복사본 반환."""
+    return list(_cached_search(query, _search_state_key(state)))
+
+
+def warmup() -> None:
+    """대표 쿼리들을 미리 검색해서 첫 추천 턴의 콜드 스타트 지연을 줄인다."""
+    for q in WARMUP_QUERIES:
+        try:
+            search_products(q)
+        except Exception as e:
+            print(f"[WARMUP] 검색 실패 ({q}): {e}")
+
 
 # =========================
 # 3. 모드 결정 로직
 # =========================
 
+# 인사 위주 문장 감지용 (추천 키워드가 없을 때만 SMALLTALK)
+_SMALLTALK_RE = re.compile(r"안녕|hello|hi|ㅎㅇ", re.IGNORECASE)
+_RECOMMEND_HINT_RE = re.compile(r"추천")
+
+
+def is_smalltalk(user_text: str) -> bool:
+    """
+    인사 위주의 잡담인지 판단.
+
+    decide_mode()의 첫 분기와 동일한 조건이라, 여기서 True면
+    parse_user_query()(LLM 파싱)를 건너뛰어도 모드 결정 결과가 같다.
+    """
+    return bool(_SMALLTALK_RE.search(user_text)) and not _RECOMMEND_HINT_RE.search(user_text)
+
+
 def decide_mode(
     user_text: str,
     parsed: Dict[str, Any],
@@ -269,10 +495,8 @@ def decide_mode(
     - 공간 + (최소/최대 예산 둘 중 하나) 있으면 → RECOMMEND
     - 그 외 → SURVEY
     """
-    low = user_text.strip().lower()
-
     # 0) 인사 위주의 문장 (추천 키워드 없을 때만)
-    if any(k in low for k in ["안녕", "hello", "hi", "ㅎㅇ"]) and "추천" not in low:
+    if is_smalltalk(user_text):
         return ChatMode.SMALLTALK
 
     # ---------- 이번 턴에서 파싱된 값 ----------
@@ -296,29 +520,12 @@ def decide_mode(
     has_current_mood = bool(state.current_moods)
 
     # 이 대화가 지금까지 모아 둔 "실제 취향 정보"가 있는지 (이전 턴 기준)
-    has_ref_image_pref = bool(
-        state.target_image_moods
-        or state.target_image_style_keywords
-        or state.target_image_description
-    )
+    has_ref_image_pref = state.has_ref_image_pref
 
-    # 현재 방 사진이 업로드되어 있는지 여부 (무드/설명/스타일 중 하나라도 있으면 True)
-    has_current_image = bool(
-        state.current_moods
-        or state.vlm_description
-        or state.style_keywords
-        or state.color_keywords
-        or state.material_keywords
-        or state.lighting_keywords
-    )
+    # 현재 방 사진이 업로드되어 있는지 여부
+    has_current_image = state.has_current_image
 
-    state_has_any_pref = (
-        bool(state.target_moods or state.target_image_moods or has_ref_image_pref)
-        or state.price_min is not None
-        or state.price_max is not None
-        or bool(state.category)
-        or bool(state.space)
-    )
+    state_has_any_pref = state.has_any_pref
 
     # 이번 턴까지 합쳐서 "취향 정보"가 있는지
     has_any_pref = (
@@ -392,6 +599,33 @@ def decide_mode(
 # 4. 추천 프롬프트 생성 유틸
 # =========================
 
+def _product_title(p: Dict[str, Any]) -> str:
+    """'브랜드 / 상품명' 형태의 상품 표시 이름."""
+    brand = (p.get("brand_name") or "").strip()
+    name = (p.get("product_name") or "").strip()
+
+    if brand:
+        return f"{brand} / {name}" if name else brand
+    return name or "(이름 없음)"
+
+
+def _format_product_line(i: int, p: Dict[str, Any]) -> str:
+    """후보 상품 한 개를 '1. 브랜드 / 상품명 (Price: ..., Link: ...)' 한 줄로 포맷."""
+    link = (p.get("link_url") or "").strip()
+    return f"{i}. {_product_title(p)} (Price: {_format_price(p.get('price'))}, Link: {link})"
+
+
+def _template_recommendation(ranked: List[Dict[str, Any]]) -> str:
+    """후보가 몇 개 안 될 때 LLM 없이 바로 보여주는 고정 추천 문구."""
+    lines = ["이 상품들이 잘 맞을 것 같아요:"]
+    for p in ranked:
+        lines.append(f"- {_product_title(p)} ({_format_price(p.get('price'))})")
+        link = (p.get("link_url") or "").strip()
+        if link:
+            lines.append(f"  {link}")
+    return "\n".join(lines)
+
+
 def build_recommendation_prompt(
     state: ChatState,
     products: List[Dict[str, Any]],
@@ -409,32 +643,12 @@ def build_recommendation_prompt(
     lines.append("다음은 RAG로 검색된 후보 상품 목록이다.")
     lines.append("각 항목의 브랜드, 이름, 가격, 링크를 반드시 그대로 활용해라.\n")
 
-    for i, p in enumerate(products, 1):
-        brand = (p.get("brand_name") or "").strip()
-        name = (p.get("product_name") or "").strip()
-        link = (p.get("link_url") or "").strip()
-        price_str = _format_price(p.get("price"))
-
-        if brand:
-            title = f"{brand} / {name}" if name else brand
-        else:
-            title = name or "(이름 없음)"
-
-        lines.append(
-            f"{i}. {title} (Price: {price_str}, Link: {link})"
-        )
+    lines.extend(_format_product_line(i, p) for i, p in enumerate(products, 1))
 
     # ==============================
     # 현재 방/공간 상태 (이미지/VLM 기준)
     # ==============================
-    has_current_image = bool(
-        state.current_moods
-        or state.vlm_description
-        or state.style_keywords
-        or state.color_keywords
-        or state.material_keywords
-        or state.lighting_keywords
-    )
+    has_current_image = state.has_current_image
 
     lines.append("\n[업로드한 방 사진에서 분석한 현재 상태(VLM)]")
 
@@ -457,7 +671,7 @@ def build_recommendation_prompt(
     # ==============================
     # 사용자가 올린 레퍼런스 이미지(원하는 분위기)
     # ==============================
-    has_ref_image = bool(state.target_image_moods or state.target_image_description or state.target_image_style_keywords or state.target_image_color_keywords or state.target_image_material_keywords or state.target_image_lighting_keywords)
+    has_ref_image = state.has_ref_image
 
     # 이미지가 없을 때는 절대 "올려주신 사진"류 표현을 하지 말도록 명시
     if not has_current_image and not has_ref_image:
@@ -567,117 +781,176 @@ def build_recommendation_prompt(
 # 5. 모드별 응답 생성
 # =========================
 
+SMALLTALK_SYSTEM_PROMPT = (
+    "너는 감성 기반 인테리어 챗봇이야. 친근한 존댓말로 2~3문장 짧게 답해줘. "
+    "딱딱한 표현(귀하, 고객님 등)은 쓰지 마."
+)
+
+
 def handle_smalltalk(user_text: str, history: List[Tuple[str, str]]) -> tuple[str, float]:
-    system_prompt = (
-        "너는 감성 기반 인테리어 챗봇이야. 친근한 존댓말로 2~3문장 짧게 답해줘. "
-        "딱딱한 표현(귀하, 고객님 등)은 쓰지 마."
-    )
     t0 = time.time()
     answer = chat(
         history=history,
         user_input=user_text,
-        system_prompt=system_prompt,
+        system_prompt=SMALLTALK_SYSTEM_PROMPT,
     )
     elapsed = time.time() - t0
     return answer, elapsed
 
 
-def handle_survey(
-    user_text: str,
-    state: ChatState,
-    history: List[Tuple[str, str]],
-) -> tuple[str, float]:
-    """
-    아직 정보가 부족할 때:
-    - 공간(거실/침실/책상 등)
-    - 예산 범위
-    - 원하는 분위기/색감/재질
-    등을 자연스럽게 물어봐 주는 모드.
-    """
-
-    # 🔹 현재 방 사진 / 레퍼런스 이미지 업로드 여부 파악
-    has_current_image = bool(
-        state.current_moods
-        or state.vlm_description
-        or state.style_keywords
-        or state.color_keywords
-        or state.material_keywords
-        or state.lighting_keywords
-    )
-    has_ref_image = bool(
-        state.target_image_moods
-        or state.target_image_description
-        or state.target_image_style_keywords
-        or state.target_image_color_keywords
-        or state.target_image_material_keywords
-        or state.target_image_lighting_keywords
+# SURVEY system 프롬프트 중 매 턴 똑같은 앞부분 (LLM KV 캐시 재사용 대상)
+_SURVEY_STATIC_PREFIX = "\n".join([
+    "너는 감성 기반 인테리어 챗봇이야. 따뜻한 존댓말로 간단히 물어봐.",
+    "",
+    "규칙:",
+    "1) 이미 사진이 있다면 '사진 다시 보내달라'는 말은 하지 않는다.",
+    "2) 사진이 없을 때만 부드럽게 업로드를 제안해도 된다.",
+    "3) 말투는 자연스러운 존댓말, '귀하/고객님' 같은 딱딱한 표현은 금지.",
+    "",
+    "",
+])
+
+_SURVEY_TPL = _SURVEY_STATIC_PREFIX + "\n".join([
+    "이미 알고 있는 정보는 아래와 같아. 이미 있는 정보는 반복해서 묻지 말고, 부족한 것 1~2개만 편하게 물어봐.",
+    "- 방 사진 업로드: {has_current_image}",
+    "- 레퍼런스 이미지 업로드: {has_ref_image}",
+    "- 공간: {space}",
+    "- 현재 무드(VLM): {current_moods}",
+    "- 목표 무드(텍스트): {target_moods}",
+    "- 목표 무드(이미지): {target_image_moods}",
+    "- 예산: {price_min} ~ {price_max}",
+    "- 색감: {color_keywords}",
+    "- 재질: {material_keywords}",
+    "",
+    "{missing_block}",
+    "한 번에 너무 많은 걸 묻지 말고, 자연스러운 한국어 대화체로 짧게 질문해 줘.",
+])
+
+
+def _survey_prompt_key(state: ChatState) -> tuple:
+    """SURVEY 프롬프트에 영향을 주는 state 필드만 모은 (해시 가능한) 키."""
+    return (
+        state.has_current_image,
+        state.has_ref_image,
+        state.space,
+        tuple(state.current_moods),
+        tuple(state.target_moods),
+        tuple(state.target_image_moods),
+        state.price_min,
+        state.price_max,
+        tuple(state.color_keywords),
+        tuple(state.material_keywords),
     )
 
+
+@lru_cache(maxsize=256)
+def _build_survey_prompt(key: tuple) -> str:
+    """_survey_prompt_key()로 만든 키 → SURVEY system 프롬프트 (state가 같으면 재사용)."""
+    (
+        has_current_image,
+        has_ref_image,
+        space,
+        current_moods,
+        target_moods,
+        target_image_moods,
+        price_min,
+        price_max,
+        color_keywords,
+        material_keywords,
+    ) = key
+
     missing_fields: List[str] = []
-    if not state.space:
+    if not space:
         missing_fields.append("공간 정보(거실/침실/작업실 등)")
-    if state.price_min is None and state.price_max is None:
+    if price_min is None and price_max is None:
         missing_fields.append("예산 범위")
     # 목표 무드가 아직 없을 때만 물어봄 (현재 무드는 이미지로 알 수 있으니)
-    if not state.target_moods and not state.target_image_moods:
+    if not target_moods and not target_image_moods:
         missing_fields.append("원하는 목표 무드/분위기")
-    if not state.color_keywords:
+    if not color_keywords:
         missing_fields.append("선호하는 색감/색상")
-    if not state.material_keywords:
+    if not material_keywords:
         missing_fields.append("선호하는 재질(원목, 패브릭 등)")
 
-    lines = [
-        "너는 감성 기반 인테리어 챗봇이야. 따뜻한 존댓말로 간단히 물어봐.",
-        "",
-        "이미 알고 있는 정보는 아래와 같아. 이미 있는 정보는 반복해서 묻지 말고, 부족한 것 1~2개만 편하게 물어봐.",
-        f"- 방 사진 업로드: {'있음' if has_current_image else '없음'}",
-        f"- 레퍼런스 이미지 업로드: {'있음' if has_ref_image else '없음'}",
-        f"- 공간: {state.space or '미정'}",
-        f"- 현재 무드(VLM): {', '.join(state.current_moods) if state.current_moods else '미정'}",
-        f"- 목표 무드(텍스트): {', '.join(state.target_moods) if state.target_moods else '미정'}",
-        f"- 목표 무드(이미지): {', '.join(state.target_image_moods) if state.target_image_moods else '미정'}",
-        f"- 예산: {state.price_min or '미정'} ~ {state.price_max or '미정'}",
-        f"- 색감: {', '.join(state.color_keywords) if state.color_keywords else '미정'}",
-        f"- 재질: {', '.join(state.material_keywords) if state.material_keywords else '미정'}",
-        "",
-        "규칙:",
-        "1) 이미 사진이 있다면 '사진 다시 보내달라'는 말은 하지 않는다.",
-        "2) 사진이 없을 때만 부드럽게 업로드를 제안해도 된다.",
-        "3) 말투는 자연스러운 존댓말, '귀하/고객님' 같은 딱딱한 표현은 금지.",
-    ]
-
     if missing_fields:
-        lines.append(
+        missing_block = (
             "특히 아직 모르는 정보는 다음과 같아: "
             + ", ".join(missing_fields)
-        )
-        lines.append(
-            "이미 값이 채워진 항목(공간, 예산, 목표 무드, 색감, 재질 등)은 절대로 다시 묻지 말고, "
+            + "\n"
+            + "이미 값이 채워진 항목(공간, 예산, 목표 무드, 색감, 재질 등)은 절대로 다시 묻지 말고, "
             "위에 나열된 '아직 정보 없음' 항목 중에서 1~2가지만 자연스럽게 질문해 줘."
         )
     else:
-        lines.append(
+        missing_block = (
             "이미 정보가 꽤 모였으니, 추가로 있으면 좋을만한 정보 한 가지만 가볍게 확인해 줘. "
             "질문은 1개만, 짧은 한국어 대화체로."
         )
 
-    lines.append(
-        "한 번에 너무 많은 걸 묻지 말고, 자연스러운 한국어 대화체로 짧게 질문해 줘."
-    )
+    return _SURVEY_TPL.format_map({
+        "has_current_image": "있음" if has_current_image else "없음",
+        "has_ref_image": "있음" if has_ref_image else "없음",
+        "space": space or "미정",
+        "current_moods": _fmt_list(current_moods),
+        "target_moods": _fmt_list(target_moods),
+        "target_image_moods": _fmt_list(target_image_moods),
+        "price_min": price_min or "미정",
+        "price_max": price_max or "미정",
+        "color_keywords": _fmt_list(color_keywords),
+        "material_keywords": _fmt_list(material_keywords),
+        "missing_block": missing_block,
+    })
 
-    system_prompt = "\n".join(lines)
+
+def handle_survey(
+    user_text: str,
+    state: ChatState,
+    history: List[Tuple[str, str]],
+) -> tuple[str, float]:
+    """
+    아직 정보가 부족할 때:
+    - 공간(거실/침실/책상 등)
+    - 예산 범위
+    - 원하는 분위기/색감/재질
+    등을 자연스럽게 물어봐 주는 모드.
+    """
+
+    system_prompt = _build_survey_prompt(_survey_prompt_key(state))
 
     t0 = time.time()
     answer = chat(
         history=history,
         user_input=user_text,
         system_prompt=system_prompt,
+        static_prefix=_SURVEY_STATIC_PREFIX,
     )
     elapsed = time.time() - t0
     return answer, elapsed
 
 
 
+def _log_rag_turn(
+    timings: Dict[str, float],
+    retrieved: List[Dict[str, Any]],
+    ranked: List[Dict[str, Any]],
+) -> None:
+    """
+    추천 턴 1회의 단계별 소요 시간을 한 줄로 남긴다.
+    (검색 t_search_ms는 쿼리 임베딩 + 벡터 검색 포함, 캐시 히트면 거의 0)
+    extra 필드로도 같이 넘기므로 구조화 로그 핸들러에서 그대로 집계할 수 있다.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    fields = dict(timings, retrieved=len(retrieved), top_k=len(ranked))
+    logger.info(
+        "rag_turn %s",
+        " ".join(
+            f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}"
+            for k, v in fields.items()
+        ),
+        extra=fields,
+    )
+
+
 def handle_recommend(
     user_text: str,
     state: ChatState,
@@ -719,55 +992,60 @@ def handle_recommend(
         )
 
     # 이미지/레퍼런스 업로드 여부
-    has_current_image = bool(
-        state.current_moods
-        or state.vlm_description
-        or state.style_keywords
-        or state.color_keywords
-        or state.material_keywords
-        or state.lighting_keywords
-    )
-    has_ref_image = bool(
-        state.target_image_moods
-        or state.target_image_description
-        or state.target_image_style_keywords
-        or state.target_image_color_keywords
-        or state.target_image_material_keywords
-        or state.target_image_lighting_keywords
-    )
+    has_current_image = state.has_current_image
+    has_ref_image = state.has_ref_image
 
-    # 1) RAG 검색 쿼리 구성
-    query = user_text
+    # 1) RAG 검색 쿼리 구성 (조각을 모아서 마지막에 한 번만 이어 붙임)
+    query_parts = [user_text]
 
     effective_targets = state.effective_target_moods
     if effective_targets:
-        query += "\n\n[사용자가 원하는 목표 무드] " + ", ".join(effective_targets)
+        # 원래 포맷대로 사용자 문장과 목표 무드 사이는 빈 줄 하나
+        query_parts.append("\n[사용자가 원하는 목표 무드] " + ", ".join(effective_targets))
     if state.current_moods:
-        query += "\n[현재 방 무드(VLM)] " + ", ".join(state.current_moods)
+        query_parts.append("[현재 방 무드(VLM)] " + ", ".join(state.current_moods))
     if state.space:
-        query += f"\n[공간] {state.space}"
+        query_parts.append(f"[공간] {state.space}")
     if state.category:
-        query += f"\n[희망 카테고리] {state.category}"
+        query_parts.append(f"[희망 카테고리] {state.category}")
     # 레퍼런스 이미지 기반 정보도 검색 쿼리에 반영
     if state.target_image_style_keywords:
-        query += "\n[레퍼런스 이미지 스타일 키워드] " + ", ".join(state.target_image_style_keywords)
+        query_parts.append("[레퍼런스 이미지 스타일 키워드] " + ", ".join(state.target_image_style_keywords))
     if state.target_image_description:
-        query += "\n[레퍼런스 이미지 요약] " + state.target_image_description
+        query_parts.append("[레퍼런스 이미지 요약] " + state.target_image_description)
+
+    query = "\n".join(query_parts)
 
     # 🔹 retriever.search: rag_retriever.py에서 state 기반 필터까지 걸어줄 수 있음
-    retrieved = retriever.search(query, state=state)
-    print(f"[DEBUG] RAG retrieved: {len(retrieved)}개")
-    if retrieved:
-        print("[DEBUG] sample retrieved[0]:", retrieved[0])
-
-    # 2) 상품 필터링/랭킹
-    ranked_all = filter_and_rank(
-        products=retrieved,
-        state=state,
-    )
-    print(f"[DEBUG] ranked_all: {len(ranked_all)}개")
-    if ranked_all:
-        print("[DEBUG] sample ranked_all[0]:", ranked_all[0])
+    #    (같은 쿼리/조건이면 캐시된 결과 재사용)
+    t_search = time.perf_counter()
+    retrieved = search_products(query, state=state)
+    t_filter = time.perf_counter()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("RAG retrieved: %d개", len(retrieved))
+        if retrieved:
+            logger.debug("sample retrieved[0]: %r", retrieved[0])
+
+    # 2) 상품 필터링/랭킹 (RAG_RERANK_ENABLED=0이면 벡터 검색 순서 그대로 사용)
+    #    검색 결과가 비어 있으면 랭커를 돌릴 필요가 없다.
+    if not retrieved:
+        ranked_all = []
+    elif RAG_RERANK_ENABLED:
+        ranked_all = filter_and_rank(
+            products=retrieved,
+            state=state,
+        )
+    else:
+        ranked_all = retrieved
+    t_filter_end = time.perf_counter()
+    timings = {
+        "t_search_ms": (t_filter - t_search) * 1000.0,
+        "t_filter_ms": (t_filter_end - t_filter) * 1000.0,
+    }
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("ranked_all: %d개", len(ranked_all))
+        if ranked_all:
+            logger.debug("sample ranked_all[0]: %r", ranked_all[0])
 
     # 예산 정보가 있는데 랭킹 결과가 0개인 경우 → 예산대에 맞는 상품 없음
     has_budget = state.price_min is not None or state.price_max is not None
@@ -791,6 +1069,7 @@ def handle_recommend(
         )
         if explain_prefix:
             msg = explain_prefix + msg
+        _log_rag_turn(timings, retrieved, [])
         return msg, 0.0, []
 
     # 예산 조건이 없고, 그냥 아무 것도 못 찾은 경우의 일반 메시지
@@ -802,19 +1081,30 @@ def handle_recommend(
         )
         if explain_prefix:
             msg = explain_prefix + msg
+        _log_rag_turn(timings, retrieved, [])
         return msg, 0.0, []
 
     # 상위 N개만 LLM에 넘김
     ranked = ranked_all[:RECOMMEND_TOP_N]
 
     # 이번 턴에 추천한 상품 id 저장 (다음 턴에 중복 페널티)
-    state.last_recommended_ids = [
-        p.get("product_id")
+    # (불변 frozenset으로 저장 → 랭킹 때 집합을 다시 만들 필요 없음)
+    state.last_recommended_ids = frozenset(
+        p["product_id"]
         for p in ranked
         if p.get("product_id")
-    ]
+    )
+
+    # 후보가 몇 개 안 되면 14B LLM을 돌리지 않고 템플릿으로 바로 답변
+    if len(ranked_all) < RECOMMEND_LLM_MIN:
+        answer = _template_recommendation(ranked)
+        if explain_prefix:
+            answer = explain_prefix + answer
+        _log_rag_turn(timings, retrieved, ranked)
+        return answer, 0.0, ranked
 
     # 3) LLM으로 자연스러운 설명 생성
+    t_prompt = time.perf_counter()
     recommendation_prompt = build_recommendation_prompt(state, ranked, user_text)
     if ranked:
         recommendation_prompt = (
@@ -829,7 +1119,8 @@ def handle_recommend(
             + recommendation_prompt
         )
 
-    t0 = time.time()
+    t0 = time.perf_counter()
+    timings["t_prompt_ms"] = (t0 - t_prompt) * 1000.0
     answer = chat(
         history=history,
         user_input=recommendation_prompt,
@@ -837,12 +1128,14 @@ def handle_recommend(
         max_new_tokens=1536,
         do_sample=False,  # 🔴 추천에서는 샘플링 끄고 greedy로 고정
     )
-    elapsed = time.time() - t0
+    elapsed = time.perf_counter() - t0
+    timings["t_llm_ms"] = elapsed * 1000.0
 
     # 안내 프리픽스 붙이기
     if explain_prefix:
         answer = explain_prefix + answer
 
+    _log_rag_turn(timings, retrieved, ranked)
     return answer, elapsed, ranked
 
 
@@ -850,49 +1143,94 @@ def handle_recommend(
 # 6. 특수 명령 처리 (::summary, ::image ... )
 # =========================
 
-def render_summary(state: ChatState) -> str:
-    lines = [
-        "[디버그 요약]",
-        "",
-        "※ current_*  = 이미지/VLM에서 추출한 '현재 방 상태'",
-        "※ target_*   = 사용자가 텍스트로 말한 '목표/원하는 상태'",
-        "※ target_image_* = 사용자가 올린 레퍼런스/원하는 분위기 이미지 기반 '목표 상태'",
-        "※ effective_target_moods = 실제 추천에 사용하는 최종 목표 무드",
-        "",
-        "[공통 정보]",
-        f"- category : {state.category}",
-        f"- space    : {state.space}",
-        f"- price    : {state.price_min} ~ {state.price_max}",
-        "",
-        "[현재 상태 (이미지/VLM 기반)]",
-        f"- current_moods           : {', '.join(state.current_moods) if state.current_moods else '없음'}",
-        f"- unknown_current_moods   : {', '.join(state.unknown_current_moods) if state.unknown_current_moods else '없음'}",
-        f"- style_keywords          : {', '.join(state.style_keywords) if state.style_keywords else '없음'}",
-        f"- color_keywords          : {', '.join(state.color_keywords) if state.color_keywords else '없음'}",
-        f"- material_keywords       : {', '.join(state.material_keywords) if state.material_keywords else '없음'}",
-        f"- lighting_keywords       : {', '.join(state.lighting_keywords) if state.lighting_keywords else '없음'}",
-        f"- vlm_description         : {state.vlm_description or '없음'}",
-        "",
-        "[목표 상태 (이미지/VLM 기반)]",
-        f"- target_image_moods        : {', '.join(state.target_image_moods) if state.target_image_moods else '없음'}",
-        f"- unknown_target_image_moods: {', '.join(state.unknown_target_image_moods) if state.unknown_target_image_moods else '없음'}",
-        f"- target_image_style        : {', '.join(state.target_image_style_keywords) if state.target_image_style_keywords else '없음'}",
-        f"- target_image_color        : {', '.join(state.target_image_color_keywords) if state.target_image_color_keywords else '없음'}",
-        f"- target_image_material     : {', '.join(state.target_image_material_keywords) if state.target_image_material_keywords else '없음'}",
-        f"- target_image_lighting     : {', '.join(state.target_image_lighting_keywords) if state.target_image_lighting_keywords else '없음'}",
-        f"- target_image_description  : {state.target_image_description or '없음'}",
-        "",
-        "[목표 상태 (사용자 텍스트 기반)]",
-        f"- target_moods            : {', '.join(state.target_moods) if state.target_moods else '없음'}",
-        f"- unknown_target_moods    : {', '.join(state.unknown_target_moods) if state.unknown_target_moods else '없음'}",
-        f"- effective_target_moods  : {', '.join(state.effective_target_moods) if state.effective_target_moods else '없음'}",
-        "",
-        f"- last_intent             : {state.last_intent}",
-    ]
-    return "\n".join(lines)
+# ::image 백그라운드 분석용 스레드풀
+_VLM_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vlm")
+
+_SUMMARY_TPL = """\
+[디버그 요약]
+
+※ current_*  = 이미지/VLM에서 추출한 '현재 방 상태'
+※ target_*   = 사용자가 텍스트로 말한 '목표/원하는 상태'
+※ target_image_* = 사용자가 올린 레퍼런스/원하는 분위기 이미지 기반 '목표 상태'
+※ effective_target_moods = 실제 추천에 사용하는 최종 목표 무드
+
+[공통 정보]
+- category : {category}
+- space    : {space}
+- price    : {price_min} ~ {price_max}
+
+[현재 상태 (이미지/VLM 기반)]
+- current_moods           : {current_moods}
+- unknown_current_moods   : {unknown_current_moods}
+- style_keywords          : {style_keywords}
+- color_keywords          : {color_keywords}
+- material_keywords       : {material_keywords}
+- lighting_keywords       : {lighting_keywords}
+- vlm_description         : {vlm_description}
+
+[목표 상태 (이미지/VLM 기반)]
+- target_image_moods        : {target_image_moods}
+- unknown_target_image_moods: {unknown_target_image_moods}
+- target_image_style        : {target_image_style_keywords}
+- target_image_color        : {target_image_color_keywords}
+- target_image_material     : {target_image_material_keywords}
+- target_image_lighting     : {target_image_lighting_keywords}
+- target_image_description  : {target_image_description}
+
+[목표 상태 (사용자 텍스트 기반)]
+- target_moods            : {target_moods}
+- unknown_target_moods    : {unknown_target_moods}
+- effective_target_moods  : {effective_target_moods}
+
+- last_intent             : {last_intent}"""
+
+# _SUMMARY_TPL에서 ", "로 이어 붙여 보여줄 리스트 필드
+_SUMMARY_LIST_FIELDS = (
+    "current_moods",
+    "unknown_current_moods",
+    "style_keywords",
+    "color_keywords",
+    "material_keywords",
+    "lighting_keywords",
+    "target_image_moods",
+    "unknown_target_image_moods",
+    "target_image_style_keywords",
+    "target_image_color_keywords",
+    "target_image_material_keywords",
+    "target_image_lighting_keywords",
+    "target_moods",
+    "unknown_target_moods",
+)
 
 
-def handle_image_command(arg: str, state: ChatState) -> str:
+def render_summary(state: ChatState) -> str:
+    """상태 요약 문자열 (상태가 바뀌지 않았으면 _version 기준으로 이전 결과 재사용)."""
+    return state._memo("summary", lambda: _render_summary(state))
+
+
+def _render_summary(state: ChatState) -> str:
+    d: Dict[str, Any] = {
+        name: _fmt_list(getattr(state, name), "없음")
+        for name in _SUMMARY_LIST_FIELDS
+    }
+    d["effective_target_moods"] = _fmt_list(state.effective_target_moods, "없음")
+    d["category"] = state.category
+    d["space"] = state.space
+    d["price_min"] = state.price_min
+    d["price_max"] = state.price_max
+    d["vlm_description"] = state.vlm_description or "없음"
+    d["target_image_description"] = state.target_image_description or "없음"
+    d["last_intent"] = state.last_intent
+    return _SUMMARY_TPL.format_map(d)
+
+
+def handle_image_command(
+    arg: str,
+    state: ChatState,
+    background: bool = False,
+    notify: Optional[Callable[[str], None]] = None,
+    is_current: Optional[Callable[[], bool]] = None,
+) -> str:
     """
     ::image 이미지_경로         → 현재 방 사진 (current_* 업데이트)
     ::image -want 이미지_경로   → 원하는 분위기/제품/방 사진 (target_image_* 업데이트)
@@ -900,6 +1238,10 @@ def handle_image_command(arg: str, state: ChatState) -> str:
     예:
       ::image "C:\\my_python\\Final_Project\\room.jpg"
       ::image -want "C:\\my_python\\Final_Project\\ref_cushion.jpg"
+
+    background=True 이면 VLM 분석을 백그라운드 스레드에 맡기고 즉시 안내 문구를 반환한다.
+    분석이 끝나면 state에 반영하고 결과 메시지를 notify로 넘긴다. (CLI 전용)
+    is_current()가 False면(그 사이 세션이 초기화됨) state에 반영하지 않는다.
     """
     arg = arg.strip()
 
@@ -912,23 +1254,72 @@ def handle_image_command(arg: str, state: ChatState) -> str:
         raw_part = raw_part[len("-want"):].strip()
 
     raw_path = raw_part.strip().strip('"').strip("'")
-    image_path = Path(raw_path)
+    return handle_image_command_v2(
+        Path(raw_path), is_want_image, state, background, notify, is_current
+    )
 
+
+def handle_image_command_v2(
+    image_path: Path,
+    is_want_image: bool,
+    state: ChatState,
+    background: bool = False,
+    notify: Optional[Callable[[str], None]] = None,
+    is_current: Optional[Callable[[], bool]] = None,
+) -> str:
+    """
+    handle_image_command의 본체 (문자열 파싱 없이 경로/옵션을 직접 받음).
+    서버처럼 이미 경로와 -want 여부를 알고 있는 호출부는 이쪽을 바로 쓴다.
+    """
     if not image_path.is_file():
         return f"[VLM] 이미지 파일을 찾을 수 없어요: {image_path}"
 
     mode_str = "원하는 레퍼런스/제품/방 사진" if is_want_image else "현재 방 사진"
     print(f"[VLM] {mode_str} 무드 분석 중... ({image_path})")
 
-    # VLM 실행 시간 측정
+    if background:
+        future = _VLM_POOL.submit(_timed_analyze, image_path)
+
+        say = notify or print
+
+        def _on_done(f: Future) -> None:
+            try:
+                info, elapsed = f.result()
+            except Exception as e:
+                say(f"[VLM] 이미지 분석 실패: {e}")
+                return
+            with state._lock:
+                if is_current is not None and not is_current():
+                    say("[VLM] 분석 중에 세션이 초기화되어서 이 이미지 결과는 반영하지 않았어요.")
+                    return
+                msg = _apply_vlm_result(info, elapsed, is_want_image, state)
+            say(f"Bot: {msg}")
+
+        future.add_done_callback(_on_done)
+        return "[VLM] 분석 중… 잠시 후 반영될게요."
+
+    info, elapsed = _timed_analyze(image_path)
+    with state._lock:
+        return _apply_vlm_result(info, elapsed, is_want_image, state)
+
+
+def _timed_analyze(image_path: Path) -> Tuple[Dict[str, Any], float]:
+    """VLM 분석 + 소요 시간 측정."""
     t0 = time.time()
     info = analyze_room_image(str(image_path))
-    t1 = time.time()
-    elapsed = t1 - t0
+    return info, time.time() - t0
 
+
+def _apply_vlm_result(
+    info: Dict[str, Any],
+    elapsed: float,
+    is_want_image: bool,
+    state: ChatState,
+) -> str:
+    """VLM 분석 결과를 state에 반영하고 사용자용 안내 메시지를 만든다."""
     # 🔍 디버그 출력
-    print("[DEBUG] raw VLM result from analyze_room_image():")
-    print(info)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("raw VLM result from analyze_room_image(): %r", info)
 
     # ==============================
     # 0) 인테리어/소품 이미지인지, 유효 결과인지 먼저 검사
@@ -1109,7 +1500,142 @@ def handle_image_command(arg: str, state: ChatState) -> str:
 # 7. 메인 루프
 # =========================
 
-def main() -> None:
+# -------------------------
+# '::' 특수 명령 핸들러 (인자 문자열 → 출력할 메시지)
+# -------------------------
+
+def _cmd_summary(arg: str) -> str:
+    return render_summary(session_state)
+
+
+def _cmd_image(arg: str) -> str:
+    state = session_state
+    return handle_image_command(
+        arg,
+        state,
+        background=True,
+        notify=_post_cli_notice,
+        is_current=lambda: state is session_state,  # ::reset_all 뒤면 버려진 state
+    )
+
+
+def _cmd_reset_all(arg: str) -> str:
+    """세션 전체 리셋."""
+    global session_state, chat_history
+    # 이전 state의 락을 잡고 교체 → 백그라운드 VLM 결과는 교체 전에 반영되거나, 교체 후 버려짐
+    with session_state._lock:
+        session_state = ChatState()
+    chat_history = []
+    return "[시스템] 세션 상태와 대화 히스토리를 모두 초기화했어요."
+
+
+def _cmd_reset_moods(arg: str) -> str:
+    """무드/스타일 관련 키워드 + VLM 설명만 리셋."""
+    with session_state._lock:
+        # 텍스트 기반 목표 무드
+        session_state.target_moods.clear()
+        session_state.unknown_target_moods.clear()
+
+        # 현재 방 상태 무드/스타일
+        session_state.current_moods.clear()
+        session_state.unknown_current_moods.clear()
+        session_state.style_keywords.clear()
+        session_state.color_keywords.clear()
+        session_state.material_keywords.clear()
+        session_state.lighting_keywords.clear()
+        session_state.vlm_description = None
+
+        # 이미지 기반 목표 상태
+        session_state.target_image_moods.clear()
+        session_state.unknown_target_image_moods.clear()
+        session_state.target_image_style_keywords.clear()
+        session_state.target_image_color_keywords.clear()
+        session_state.target_image_material_keywords.clear()
+        session_state.target_image_lighting_keywords.clear()
+        session_state.target_image_description = None
+        session_state.touch()
+
+    return "[시스템] 현재/목표 무드와 스타일 관련 키워드(VLM/텍스트/레퍼런스 이미지)를 초기화했어요."
+
+
+_COMMANDS: Dict[str, Callable[[str], str]] = {
+    "::summary": _cmd_summary,
+    "::image": _cmd_image,
+    "::reset_all": _cmd_reset_all,
+    "::reset_moods": _cmd_reset_moods,
+}
+
+
+# 메인 루프 큐 항목: ("input", 사용자 입력) / ("notice", 백그라운드 작업 메시지), None = 종료
+_CliEvent = Optional[Tuple[str, str]]
+
+# 메인 루프가 뜬 뒤 설정됨 (다른 스레드에서 메인 루프 큐로 메시지를 넣는 함수)
+_cli_post: Optional[Callable[[_CliEvent], None]] = None
+
+
+def _post_cli_notice(msg: str) -> None:
+    """
+    백그라운드 작업(VLM 등) 메시지를 메인 루프로 넘겨서 다른 출력과 같은 경로로 출력.
+    (풀 스레드에서 바로 print하면 다른 출력/입력 프롬프트와 뒤섞임)
+    """
+    if _cli_post is None:
+        print(f"\n{msg}\n")
+    else:
+        _cli_post(("notice", msg))
+
+
+def _read_input_lines(post: Callable[[_CliEvent], None]) -> None:
+    """
+    (입력 전용 데몬 스레드) 사용자 입력을 계속 읽어 메인 루프 큐에 넣는다.
+    LLM/VLM 처리 중에도 다음 입력(::image 등)을 미리 받아 둘 수 있다.
+    EOF/종료 명령이면 None을 넣고 끝낸다.
+    """
+    while True:
+        try:
+            line = input("You: ").strip()
+        except (EOFError, KeyboardInterrupt):
+            post(None)
+            return
+
+        post(("input", line))
+        if line.lower() in {"exit", "quit"}:
+            return
+
+
+def _run_chat_turn(user_text: str) -> Tuple[str, float]:
+    """일반 대화 한 턴 처리 (파싱 → 모드 결정 → LLM 응답). 실행기 스레드에서 호출된다."""
+    # 백그라운드 VLM 결과 반영과 겹치지 않도록 턴 처리 동안 state 잠금
+    with session_state._lock:
+        session_state.last_user_message = user_text
+
+        # 1) 이번 턴 파싱 (인사 위주 문장이면 LLM 파싱 생략)
+        parsed = {} if is_smalltalk(user_text) else parse_user_query(user_text)
+
+        # 2) 파싱 결과와 기존 state를 기반으로 모드 결정
+        mode = decide_mode(user_text, parsed, session_state)
+        session_state.last_intent = mode.name
+
+        # 3) SMALLTALK이 아닐 때만 state에 누적
+        if mode != ChatMode.SMALLTALK:
+            session_state.update_from_parsed(parsed)
+
+        # 4) 모드별 응답 생성 (최근 MAX_HISTORY_TURNS 턴만 LLM 컨텍스트로 사용)
+        context = chat_history[-MAX_HISTORY_TURNS:]
+        if mode == ChatMode.SMALLTALK:
+            return handle_smalltalk(user_text, context)
+        if mode == ChatMode.SURVEY:
+            return handle_survey(user_text, session_state, context)
+        answer, llm_sec, _ = handle_recommend(user_text, session_state, context)
+        return answer, llm_sec
+
+
+async def main() -> None:
+    # MOODON_LOG=DEBUG 로 실행하면 RAG/VLM 디버그 로그까지 출력
+    logging.basicConfig(
+        level=os.environ.get("MOODON_LOG", "INFO").upper(),
+        format="[%(levelname)s] %(name)s: %(message)s",
+    )
+
     print("===============================================")
     print("  감성 기반 상품 추천 챗봇 (RAG + Qwen2.5-14B-Korean)")
     print("   - 종료하려면 'exit' 또는 'quit' 입력")
@@ -1120,15 +1646,35 @@ def main() -> None:
     print("   - 예: '방 분위기를 바꾸고 싶어'라고 말하면, 내가 먼저 공간/예산/무드를 물어볼 거야.")
     print("===============================================")
 
-    global session_state, chat_history
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, warmup)
+
+    # 입력 스레드 / VLM 풀(producer) → queue → 아래 루프(consumer, 출력은 여기서만)
+    global _cli_post
+    queue: "asyncio.Queue[_CliEvent]" = asyncio.Queue()
+
+    def _post(event: _CliEvent) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    _cli_post = _post
+    threading.Thread(
+        target=_read_input_lines,
+        args=(_post,),
+        name="cli-input",
+        daemon=True,
+    ).start()
 
     while True:
-        try:
-            user_text = input("You: ").strip()
-        except (EOFError, KeyboardInterrupt):
+        event = await queue.get()
+        if event is None:
             print("\n[시스템] 종료합니다.")
             break
 
+        kind, user_text = event
+        if kind == "notice":
+            print(f"\n{user_text}\n")
+            continue
+
         if not user_text:
             continue
 
@@ -1136,72 +1682,15 @@ def main() -> None:
             print("[시스템] 안녕히 가세요!")
             break
 
-        # 특수 명령 처리
-        if user_text.startswith("::summary"):
-            print(render_summary(session_state))
+        # 특수 명령 처리 (첫 단어로 바로 찾기)
+        head, _, arg = user_text.partition(" ")
+        handler = _COMMANDS.get(head)
+        if handler is not None:
+            print(handler(arg.strip()))
             continue
 
-        if user_text.startswith("::image"):
-            arg = user_text[len("::image"):].strip()
-            resp = handle_image_command(arg, session_state)
-            print(resp)
-            continue
-
-        # 세션 전체 리셋
-        if user_text.startswith("::reset_all"):
-            session_state = ChatState()
-            chat_history = []
-            print("[시스템] 세션 상태와 대화 히스토리를 모두 초기화했어요.")
-            continue
-
-        # 무드/스타일 관련 키워드 + VLM 설명만 리셋
-        if user_text.startswith("::reset_moods"):
-            # 텍스트 기반 목표 무드
-            session_state.target_moods.clear()
-            session_state.unknown_target_moods.clear()
-
-            # 현재 방 상태 무드/스타일
-            session_state.current_moods.clear()
-            session_state.unknown_current_moods.clear()
-            session_state.style_keywords.clear()
-            session_state.color_keywords.clear()
-            session_state.material_keywords.clear()
-            session_state.lighting_keywords.clear()
-            session_state.vlm_description = None
-
-            # 이미지 기반 목표 상태
-            session_state.target_image_moods.clear()
-            session_state.unknown_target_image_moods.clear()
-            session_state.target_image_style_keywords.clear()
-            session_state.target_image_color_keywords.clear()
-            session_state.target_image_material_keywords.clear()
-            session_state.target_image_lighting_keywords.clear()
-            session_state.target_image_description = None
-
-            print("[시스템] 현재/목표 무드와 스타일 관련 키워드(VLM/텍스트/레퍼런스 이미지)를 초기화했어요.")
-            continue
-
-        # 일반 대화 처리
-        session_state.last_user_message = user_text
-
-        # 1) 이번 턴 파싱
-        parsed = parse_user_query(user_text)
-
-        # 2) 파싱 결과와 기존 state를 기반으로 모드 결정
-        mode = decide_mode(user_text, parsed, session_state)
-        session_state.last_intent = mode.name
-
-        # 3) SMALLTALK이 아닐 때만 state에 누적
-        if mode != ChatMode.SMALLTALK:
-            session_state.update_from_parsed(parsed)
-
-        # 4) 모드별 응답 생성
-        if mode == ChatMode.SMALLTALK:
-            answer, llm_sec = handle_smalltalk(user_text, chat_history)
-        elif mode == ChatMode.SURVEY:
-            answer, llm_sec = handle_survey(user_text, session_state, chat_history)
-        else:
-            answer, llm_sec = handle_recommend(user_text, session_state, chat_history)
+        # 일반 대화 처리 (LLM 호출은 실행기 스레드에서 → 그동안 입력/VLM은 계속 진행)
+        answer, llm_sec = await loop.run_in_executor(None, _run_chat_turn, user_text)
 
         print(f"\nBot: {answer}\n")
         print(f"[LLM] 응답 생성 소요 시간: {llm_sec:.1f}초\n")
@@ -1211,4 +1700,7 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n[시스템] 종료합니다.")
@@ -36,6 +36,10 @@ FastAPI 기반 모델 서버
    - 요청: { "session_id": "..." }
    - 응답: { "session_id": "...", "status": "reset" }
 
+4) POST /warmup
+   - 대표 쿼리로 임베딩/RAG 검색 경로를 미리 데움 (프론트 시작 시 호출)
+   - 응답: { "status": "warm" }
+
 로컬에서 테스트
 ---------------
 가상환경(final_project)에서:
@@ -46,29 +50,64 @@ FastAPI 기반 모델 서버
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
+import operator
+import os
 import shutil
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from fastapi import FastAPI, File, Form, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import threading
+
+try:
+    # 선택 의존성: 있으면 응답 JSON 인코딩을 orjson으로 처리
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as _FastJSONResponse
+except ImportError:
+    _FastJSONResponse = JSONResponse
 
 # 기존 모듈들에서 필요한 것들 가져오기
+from config import (
+    LLM_BATCH_WINDOW_MS,
+    LLM_MAX_BATCH,
+    MAX_HISTORY_TURNS,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_MAX_BYTES,
+    SESSION_MAX_COUNT,
+    SESSION_MAX_HISTORY,
+    SESSION_TTL,
+    UPLOAD_TMP_DIR,
+)
 from llm_core import parse_user_query  # 카테고리/무드/예산/공간 파싱
+from mood_vocab import get_mood_vocab
+from rag_index import close_clients, embed_text_quick
+from semantic_cache import SmartRAGCache
 
 # main.py에는 상태머신과 모드별 핸들러가 들어있다고 가정
 from main import (
     ChatState,
     ChatMode,
     decide_mode,
+    is_smalltalk,
     handle_smalltalk,
     handle_survey,
     handle_recommend,
     render_summary,
-    handle_image_command,
+    handle_image_command_v2,
+    warmup,
 )
 
 # ------------------------------------------------------------
@@ -90,18 +129,130 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ------------------------------------------------------------
+# 모델 작업 큐 (LLM/VLM 호출은 워커 하나가 FIFO로 순서대로 처리)
+# ------------------------------------------------------------
+# 무거운 GPU 작업을 anyio 스레드풀에 그대로 흩뿌리면 요청끼리 GPU를 두고 경쟁해서
+# 모두 느려지므로, 엔드포인트는 작업을 큐에 넣고 결과만 기다린다.
+#
+# 텍스트 턴(batch_key=세션 ID)은 LLM_BATCH_WINDOW_MS 안에 들어온 것끼리 묶어서
+# 동시에 실행한다. 그 안의 chat() 호출들은 llm_core의 generate 배처가
+# 한 번의 forward로 합쳐 준다. (같은 세션의 턴은 들어온 순서대로 차례로 실행)
+
+_Job = Tuple[Callable[..., Any], tuple, asyncio.Future, Optional[str]]
+
+_BATCH_WINDOW_SEC = LLM_BATCH_WINDOW_MS / 1000.0
+
+
+async def _run_job(job: _Job) -> None:
+    fn, args, fut, _ = job
+    try:
+        result = await asyncio.to_thread(fn, *args)
+    except Exception as e:
+        if not fut.done():
+            fut.set_exception(e)
+    else:
+        if not fut.done():
+            fut.set_result(result)
+
+
+async def _run_jobs_in_order(jobs: List[_Job]) -> None:
+    for job in jobs:
+        await _run_job(job)
+
+
+async def _server_loop(queue: "asyncio.Queue[_Job]") -> None:
+    loop = asyncio.get_running_loop()
+    carry: Optional[_Job] = None
+
+    while True:
+        first = carry if carry is not None else await queue.get()
+        carry = None
+
+        # 배칭 대상이 아닌 작업(이미지/VLM 등)은 단독 실행
+        if first[3] is None:
+            await _run_job(first)
+            queue.task_done()
+            continue
+
+        # window 동안 들어오는 텍스트 턴을 최대 LLM_MAX_BATCH개까지 모은다
+        batch = [first]
+        deadline = loop.time() + _BATCH_WINDOW_SEC
+        while len(batch) < LLM_MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                job = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if job[3] is None:
+                carry = job  # 다음 차례에 단독 실행
+                break
+            batch.append(job)
+
+        by_session: Dict[str, List[_Job]] = {}
+        for job in batch:
+            by_session.setdefault(job[3], []).append(job)
+        await asyncio.gather(*(_run_jobs_in_order(jobs) for jobs in by_session.values()))
+
+        for _ in batch:
+            queue.task_done()
+
+
+@app.on_event("startup")
+async def _preload_mood_vocab() -> None:
+    # 첫 요청이 사전 JSON 로딩/정렬 비용을 내지 않도록 미리 로딩
+    await asyncio.to_thread(get_mood_vocab)
+
+
+@app.on_event("startup")
+async def _start_model_worker() -> None:
+    app.state.model_queue = asyncio.Queue()
+    app.state.model_worker = asyncio.create_task(_server_loop(app.state.model_queue))
+
+
+@app.on_event("shutdown")
+async def _stop_model_worker() -> None:
+    app.state.model_worker.cancel()
+
+
+@app.on_event("shutdown")
+async def _close_openai_clients() -> None:
+    await close_clients()
+
+
+async def _submit(fn: Callable[..., Any], *args: Any, batch_key: Optional[str] = None) -> Any:
+    """
+    fn(*args)를 모델 작업 큐에 넣고, 워커가 처리한 결과를 기다린다.
+    batch_key(세션 ID)를 주면 다른 세션의 작업과 묶어서 동시에 실행될 수 있다.
+    """
+    fut = asyncio.get_running_loop().create_future()
+    await app.state.model_queue.put((fn, args, fut, batch_key))
+    return await fut
+
+
 # ------------------------------------------------------------
 # 세션 상태/히스토리 저장소 (간단한 in-memory 구현)
 # ------------------------------------------------------------
 
-_session_lock = threading.Lock()
-_sessions: Dict[str, ChatState] = {}
-_histories: Dict[str, List[Tuple[str, str]]] = {}
+# session_id → (상태, 히스토리, 마지막 접근 시각). 접근 순서(LRU)로 정렬되어 있어
+# 맨 앞부터 TTL 만료/개수 초과 세션을 지운다.
+_sessions: "OrderedDict[str, Tuple[ChatState, List[Tuple[str, str]], float]]" = OrderedDict()
+# 딕셔너리 조회/정리 동안만 잡는 짧은 락 (세션 내용은 ChatState._lock이 보호)
+_sessions_lock = threading.Lock()
 
-# 업로드 이미지 임시 저장 디렉토리
+# 업로드 이미지 임시 저장 디렉토리 (기본은 /dev/shm 아래 → 디스크 IO 없음)
 BASE_DIR = Path(__file__).resolve().parent
-TMP_DIR = BASE_DIR / "tmp_uploads"
-TMP_DIR.mkdir(parents=True, exist_ok=True)
+TMP_DIR = UPLOAD_TMP_DIR
+try:
+    TMP_DIR.mkdir(parents=True, exist_ok=True)
+except OSError:
+    TMP_DIR = BASE_DIR / "tmp_uploads"
+    TMP_DIR.mkdir(parents=True, exist_ok=True)
+
+# Linux에서는 디렉토리 항목 없는 임시 파일(O_TMPFILE)로 받아서 unlink도 필요 없게 한다
+_O_TMPFILE = getattr(os, "O_TMPFILE", 0) if Path("/proc/self/fd").is_dir() else 0
 
 
 def _get_or_create_session(
@@ -109,51 +260,182 @@ def _get_or_create_session(
 ) -> Tuple[str, ChatState, List[Tuple[str, str]]]:
     """
     세션 ID가 없으면 새로 만들고, 있으면 기존 상태/히스토리를 가져온다.
-    """
-    with _session_lock:
-        if not session_id or session_id not in _sessions:
-            new_id = session_id or str(uuid.uuid4())
-            _sessions[new_id] = ChatState()
-            _histories[new_id] = []
-            return new_id, _sessions[new_id], _histories[new_id]
 
-        return session_id, _sessions[session_id], _histories[session_id]
+    세션 저장소 락은 딕셔너리 조회/정리 동안만 잡는다.
+    세션 상태 자체의 동시 수정은 ChatState._lock(세션별 락)으로 보호한다.
+    """
+    now = time.monotonic()
+    with _sessions_lock:
+        entry = _sessions.get(session_id) if session_id else None
+        if entry is not None and now - entry[2] <= SESSION_TTL:
+            _sessions.move_to_end(session_id)
+        else:
+            session_id = session_id or str(uuid.uuid4())
+            entry = (ChatState(), [], now)
+        _sessions[session_id] = (entry[0], entry[1], now)
+        _evict_sessions(now)
+    return session_id, entry[0], entry[1]
+
+
+def _evict_sessions(now: float) -> None:
+    """TTL이 지났거나 최대 개수를 넘는 오래된 세션 정리 (_sessions_lock 안에서 호출)."""
+    while _sessions:
+        oldest_id, (_, _, last_seen) = next(iter(_sessions.items()))
+        if now - last_seen <= SESSION_TTL and len(_sessions) <= SESSION_MAX_COUNT:
+            break
+        del _sessions[oldest_id]
 
 
 def _reset_session(session_id: str) -> None:
     """
     세션 상태와 히스토리를 완전히 삭제.
     """
-    with _session_lock:
+    with _sessions_lock:
         _sessions.pop(session_id, None)
-        _histories.pop(session_id, None)
+
+
+# 프론트/웹서버로 내보내는 ChatState 필드 (순서 = 응답 JSON 키 순서)
+_STATE_FIELDS: Tuple[str, ...] = (
+    "category",
+    "space",
+    "price_min",
+    "price_max",
+    "target_moods",
+    "unknown_target_moods",
+    "current_moods",
+    "unknown_current_moods",
+    "style_keywords",
+    "color_keywords",
+    "material_keywords",
+    "lighting_keywords",
+    "vlm_description",
+    "target_image_moods",
+    "target_image_style_keywords",
+    "target_image_color_keywords",
+    "target_image_material_keywords",
+    "target_image_lighting_keywords",
+    "target_image_description",
+    "last_intent",
+)
+_get_state_fields = operator.attrgetter(*_STATE_FIELDS)
 
 
 def _state_to_dict(state: ChatState) -> Dict[str, Any]:
     """
     ChatState를 프론트/웹서버가 이해할 수 있는 dict로 직렬화.
+    (attrgetter 한 번으로 필드를 모두 읽는다)
+    """
+    return dict(zip(_STATE_FIELDS, _get_state_fields(state)))
+
+
+# ------------------------------------------------------------
+# 의미 기반 응답 캐시 (같은 상태 + 거의 같은 문장 → 이전 응답 재사용)
+# ------------------------------------------------------------
+
+_semantic_cache: Optional[SmartRAGCache] = (
+    SmartRAGCache(
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        ttl=SEMANTIC_CACHE_TTL,
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+        max_bytes=SEMANTIC_CACHE_MAX_BYTES,
+    )
+    if SEMANTIC_CACHE_ENABLED
+    else None
+)
+
+
+def _turn_key(state: ChatState, history: List[Tuple[str, str]]) -> str:
+    """
+    응답에 영향을 주는 것 전체의 지문:
+    세션 상태(직전 추천 상품 id 포함) + LLM에 같이 넘어가는 최근 MAX_HISTORY_TURNS 턴.
+    (히스토리가 키에 없으면 새 세션끼리 상태가 같아서 다른 사용자의 응답이 재사용될 수 있음)
+    """
+    d = _state_to_dict(state)
+    d["last_recommended_ids"] = sorted(state.last_recommended_ids)
+    d["history"] = history[-MAX_HISTORY_TURNS:]
+    payload = json.dumps(d, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# 캐시 조회용 문장 임베딩은 턴 처리와 따로 돈다 (턴이 임베딩 API를 기다리지 않도록)
+_embed_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-embed")
+
+
+def _embed_user_text(user_text: str):
+    """사용자 문장 임베딩 (느리거나 실패하면 None → 캐시 없이 그냥 진행)."""
+    try:
+        return embed_text_quick(SmartRAGCache.normalize_text(user_text))
+    except Exception:
+        return None
+
+
+def _start_query_embedding(user_text: str) -> Optional[Future]:
     """
+    턴을 큐에 넣으면서 같이 시작하는 문장 임베딩.
+    턴 처리 쪽은 이 결과를 기다리지 않는다: 파싱이 끝났을 때 준비돼 있으면 유사도 조회에 쓰고,
+    캐시 저장은 임베딩이 끝나는 시점에 한다.
+    """
+    if _semantic_cache is None:
+        return None
+    return _embed_pool.submit(_embed_user_text, user_text)
+
+
+def _ready_embedding(emb_future: Optional[Future]):
+    """이미 끝난 임베딩 결과만 꺼냄 (아직이면/실패면 None, 기다리지 않음)."""
+    if emb_future is None or not emb_future.done() or emb_future.cancelled():
+        return None
+    return emb_future.result()
+
+
+def _store_when_embedded(
+    emb_future: Optional[Future],
+    user_text: str,
+    turn_key: str,
+    payload: Dict[str, Any],
+) -> None:
+    """임베딩이 끝나면(이미 끝났으면 바로) 이번 턴 결과를 캐시에 저장."""
+    if emb_future is None or _semantic_cache is None:
+        return
+
+    def _store(f: Future) -> None:
+        if f.cancelled():
+            return
+        emb = f.result()
+        if emb is not None:
+            _semantic_cache.store(user_text, emb, turn_key, payload)
+
+    emb_future.add_done_callback(_store)
+
+
+def _replay_cached_turn(
+    session_id: str,
+    state: ChatState,
+    history: List[Tuple[str, str]],
+    user_text: str,
+    cached: Dict[str, Any],
+) -> Dict[str, Any]:
+    """캐시된 턴 결과를 현재 세션에 반영 (LLM 없이 state/히스토리만 갱신)."""
+    state.last_user_message = user_text
+    state.last_intent = cached["mode"]
+    if cached["mode"] != ChatMode.SMALLTALK.name:
+        state.update_from_parsed(cached["parsed"])
+    if cached["products"]:
+        state.last_recommended_ids = frozenset(
+            p["product_id"] for p in cached["products"] if p.get("product_id")
+        )
+
+    history.append((user_text, cached["reply"]))
+    if len(history) > SESSION_MAX_HISTORY:
+        del history[: len(history) - SESSION_MAX_HISTORY]
+
     return {
-        "category": state.category,
-        "space": state.space,
-        "price_min": state.price_min,
-        "price_max": state.price_max,
-        "target_moods": state.target_moods,
-        "unknown_target_moods": state.unknown_target_moods,
-        "current_moods": state.current_moods,
-        "unknown_current_moods": state.unknown_current_moods,
-        "style_keywords": state.style_keywords,
-        "color_keywords": state.color_keywords,
-        "material_keywords": state.material_keywords,
-        "lighting_keywords": state.lighting_keywords,
-        "vlm_description": state.vlm_description,
-        "target_image_moods": state.target_image_moods,
-        "target_image_style_keywords": state.target_image_style_keywords,
-        "target_image_color_keywords": state.target_image_color_keywords,
-        "target_image_material_keywords": state.target_image_material_keywords,
-        "target_image_lighting_keywords": state.target_image_lighting_keywords,
-        "target_image_description": state.target_image_description,
-        "last_intent": state.last_intent,
+        "session_id": session_id,
+        "reply": cached["reply"],
+        "mode": cached["mode"],
+        "llm_latency": 0.0,
+        "debug_state_summary": render_summary(state),
+        "session_state": _state_to_dict(state),
+        "products": cached["products"],
     }
 
 
@@ -211,12 +493,22 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.post("/warmup")
+async def warmup_endpoint():
+    """
+    대표 쿼리로 임베딩/Chroma 검색을 한 번씩 돌려서 캐시·커넥션·HNSW 인덱스를 데워 둔다.
+    (프론트가 뜰 때 호출. 결과는 검색 캐시에 남으므로 여러 번 불러도 가볍다)
+    """
+    await asyncio.to_thread(warmup)
+    return {"status": "warm"}
+
+
 # ------------------------------------------------------------
 # 텍스트 대화 엔드포인트
 # ------------------------------------------------------------
 
 @app.post("/chat/text", response_model=TextChatResponse)
-def chat_text(req: TextChatRequest):
+async def chat_text(req: TextChatRequest):
     """
     텍스트 기반 대화/추천 엔드포인트.
 
@@ -246,10 +538,16 @@ def chat_text(req: TextChatRequest):
 
     # 여기서는 ::reset_all, ::reset_moods 는 별도 API로 처리하는 걸 권장하므로 생략
 
-    # 3) 본격 대화 처리
-    text_result = _run_text_turn(session_id, state, history, user_text)
+    # 3) 본격 대화 처리 (모델 작업 큐에서 순서대로 실행)
+    emb_future = _start_query_embedding(user_text)
+    text_result = await _submit(
+        _run_text_turn, session_id, state, history, user_text, emb_future,
+        batch_key=session_id,
+    )
 
-    return TextChatResponse(**text_result)
+    # 서버가 직접 만든 dict라 pydantic 재검증 없이 그대로 인코딩
+    # (response_model은 OpenAPI 문서용으로만 남겨 둠)
+    return _FastJSONResponse(text_result)
 
 
 def _run_text_turn(
@@ -257,53 +555,117 @@ def _run_text_turn(
     state: ChatState,
     history: List[Tuple[str, str]],
     user_text: str,
+    emb_future: Optional[Future] = None,
 ) -> Dict[str, Any]:
-    """텍스트 턴 처리 공통 함수 (chat_text + 이미지 동시 입력 시 재사용)."""
-    state.last_user_message = user_text  # main.py와 동일한 필드 사용 가정
-
-    # 1) 파싱
-    parsed = parse_user_query(user_text)
-
-    # 2) 모드 결정
-    mode = decide_mode(user_text, parsed, state)
-    state.last_intent = mode.name
-
-    # 3) SMALLTALK이 아닐 때만 state에 누적
-    if mode != ChatMode.SMALLTALK:
-        state.update_from_parsed(parsed)
-
-    # 4) 모드별 응답 생성
-    products: List[Dict[str, Any]] = []
-    if mode == ChatMode.SMALLTALK:
-        answer, llm_sec = handle_smalltalk(user_text, history)
-        products = []
-    elif mode == ChatMode.SURVEY:
-        answer, llm_sec = handle_survey(user_text, state, history)
-        products = []
-    else:
-        answer, llm_sec, products = handle_recommend(user_text, state, history)
-
-    # 5) 히스토리 업데이트
-    history.append((user_text, answer))
+    """
+    텍스트 턴 처리 공통 함수 (chat_text + 이미지 동시 입력 시 재사용).
+    emb_future: _start_query_embedding()으로 같이 시작한 문장 임베딩 (기다리지 않음)
+    """
+    # 같은 세션에 대한 턴/이미지 반영이 겹치지 않도록 세션별 락 안에서 처리
+    with state._lock:
+        # 0) 응답 캐시 확인: 상태/최근 대화가 같고 문장(정규화)도 같으면 바로 재사용
+        turn_key = ""
+        if _semantic_cache is not None:
+            turn_key = _turn_key(state, history)
+            cached = _semantic_cache.get_exact(user_text, turn_key)
+            if cached is not None:
+                if emb_future is not None:
+                    emb_future.cancel()
+                return _replay_cached_turn(session_id, state, history, user_text, cached)
+
+        # 1) 파싱 (인사 위주 문장이면 LLM 파싱 생략)
+        parsed = {} if is_smalltalk(user_text) else parse_user_query(user_text)
+
+        # 2) 모드 결정
+        mode = decide_mode(user_text, parsed, state)
+
+        # 문장이 비슷한 캐시 항목은 임베딩이 이미 준비돼 있고, 파싱 결과/모드까지 같을 때만 재사용
+        # ("5만원 이하 러그" vs "50만원 이하 러그"처럼 숫자만 다른 문장 방지)
+        query_emb = _ready_embedding(emb_future)
+        if query_emb is not None:
+            near = _semantic_cache.lookup(query_emb, turn_key)
+            if near is not None and near["parsed"] == parsed and near["mode"] == mode.name:
+                return _replay_cached_turn(session_id, state, history, user_text, near)
+
+        state.last_user_message = user_text  # main.py와 동일한 필드 사용 가정
+        state.last_intent = mode.name
+
+        # 3) SMALLTALK이 아닐 때만 state에 누적
+        if mode != ChatMode.SMALLTALK:
+            state.update_from_parsed(parsed)
+
+        # 4) 모드별 응답 생성 (최근 MAX_HISTORY_TURNS 턴만 LLM 컨텍스트로 사용)
+        context = history[-MAX_HISTORY_TURNS:]
+        products: List[Dict[str, Any]] = []
+        if mode == ChatMode.SMALLTALK:
+            answer, llm_sec = handle_smalltalk(user_text, context)
+            products = []
+        elif mode == ChatMode.SURVEY:
+            answer, llm_sec = handle_survey(user_text, state, context)
+            products = []
+        else:
+            answer, llm_sec, products = handle_recommend(user_text, state, context)
+
+        # 5) 히스토리 업데이트 (오래된 턴은 버려서 세션당 메모리 상한 유지)
+        history.append((user_text, answer))
+        if len(history) > SESSION_MAX_HISTORY:
+            del history[: len(history) - SESSION_MAX_HISTORY]
+
+        _store_when_embedded(
+            emb_future,
+            user_text,
+            turn_key,
+            {
+                "parsed": parsed,
+                "mode": mode.name,
+                "reply": answer,
+                "products": products,
+            },
+        )
 
-    # 6) 디버그용 상태 요약
-    debug_summary = render_summary(state)
+        # 6) 디버그용 상태 요약
+        debug_summary = render_summary(state)
 
-    return {
-        "session_id": session_id,
-        "reply": answer,
-        "mode": mode.name,
-        "llm_latency": float(llm_sec),
-        "debug_state_summary": debug_summary,
-        "session_state": _state_to_dict(state),
-        "products": products,
-    }
+        return {
+            "session_id": session_id,
+            "reply": answer,
+            "mode": mode.name,
+            "llm_latency": float(llm_sec),
+            "debug_state_summary": debug_summary,
+            "session_state": _state_to_dict(state),
+            "products": products,
+        }
 
 
 # ------------------------------------------------------------
 # 이미지 기반 VLM 엔드포인트
 # ------------------------------------------------------------
 
+_UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB
+
+
+def _save_upload(src, dst: Path) -> None:
+    """업로드 스트림을 1MB 단위로 dst 파일에 저장."""
+    with dst.open("wb") as f:
+        shutil.copyfileobj(src, f, _UPLOAD_CHUNK_SIZE)
+
+
+def _create_upload_target(session_id: str, suffix: str) -> Tuple[Optional[int], Path]:
+    """
+    업로드를 저장할 위치 → (fd, 경로).
+    O_TMPFILE이 되면 이름 없는 파일의 fd와 /proc/self/fd/N 경로 (fd를 닫으면 사라짐),
+    안 되면 (None, TMP_DIR 아래 일반 파일 경로).
+    """
+    if _O_TMPFILE:
+        try:
+            fd = os.open(TMP_DIR, _O_TMPFILE | os.O_RDWR, 0o600)
+        except OSError:
+            pass  # 파일시스템이 O_TMPFILE을 지원하지 않음 → 일반 파일로
+        else:
+            return fd, Path(f"/proc/self/fd/{fd}")
+    return None, TMP_DIR / f"{session_id}_{uuid.uuid4().hex}{suffix}"
+
+
 @app.post("/chat/image", response_model=ImageChatResponse)
 async def chat_image(
     session_id: Optional[str] = Form(None),
@@ -315,60 +677,63 @@ async def chat_image(
     """
     방/레퍼런스 이미지 업로드 → VLM 분석 → 상태 업데이트.
 
-    - 기존 main.py의 handle_image_command()를 그대로 재사용한다.
-    - handle_image_command()는 내부에서:
+    - 기존 main.py의 handle_image_command_v2()를 그대로 재사용한다.
+    - handle_image_command_v2()는 내부에서:
       · analyze_room_image() (input_vlm.py)
       · 인테리어/소품 필터링
       · ChatState의 current_* / target_image_* 필드 업데이트
       · 한국어 요약 문자열을 반환
     """
     # 1) 세션 상태 가져오기/생성
-    session_id, state, _history = _get_or_create_session(session_id)
+    session_id, state, history = _get_or_create_session(session_id)
 
     # 2) 업로드 파일을 임시 디렉토리에 저장
     if not file.filename:
         raise HTTPException(status_code=400, detail="파일 이름이 비어 있습니다.")
 
     suffix = Path(file.filename).suffix or ".jpg"
-    tmp_path = TMP_DIR / f"{session_id}_{uuid.uuid4().hex}{suffix}"
+    tmp_fd, tmp_path = _create_upload_target(session_id, suffix)
 
+    # 블로킹 파일 복사는 스레드에서 (업로드 중에도 이벤트 루프가 다른 요청을 처리하도록)
     try:
-        with tmp_path.open("wb") as f:
-            shutil.copyfileobj(file.file, f)
+        await asyncio.to_thread(_save_upload, file.file, tmp_path)
+    except BaseException:
+        if tmp_fd is not None:
+            os.close(tmp_fd)
+        raise
     finally:
         file.file.close()
 
-    # 3) 기존 CLI용 handle_image_command를 재사용하기 위해
-    #    "-want" 옵션 포함한 인자 문자열을 만들어 준다.
-    if is_want:
-        # 레퍼런스/원하는 분위기 이미지
-        arg = f'-want "{tmp_path}"'
-    else:
-        # 현재 방 이미지
-        arg = f'"{tmp_path}"'
-
-    # 4) VLM 처리 + ChatState 업데이트
+    # 3) VLM 처리 + ChatState 업데이트 (모델 작업 큐에서 순서대로 실행)
+    #    is_want=True면 레퍼런스/원하는 분위기 이미지, 아니면 현재 방 이미지
     try:
-        image_message = handle_image_command(arg, state)
+        image_message = await _submit(handle_image_command_v2, tmp_path, is_want, state)
     finally:
         # 사용 끝난 임시 파일 제거 (실패해도 크게 상관 없으므로 예외 무시)
-        try:
-            tmp_path.unlink(missing_ok=True)  # Python 3.8 이하면 exist_ok 처리 필요
-        except TypeError:
-            # Python <3.8 호환용
-            if tmp_path.exists():
-                tmp_path.unlink()
-
-    # 5) 상태 요약까지 같이 반환 (프론트에서 디버그 탭에 보여줄 수 있음)
+        if tmp_fd is not None:
+            os.close(tmp_fd)  # 이름 없는 파일은 fd를 닫으면 바로 사라짐
+        else:
+            try:
+                tmp_path.unlink(missing_ok=True)  # Python 3.8 이하면 exist_ok 처리 필요
+            except TypeError:
+                # Python <3.8 호환용
+                if tmp_path.exists():
+                    tmp_path.unlink()
+
+    # 4) 상태 요약까지 같이 반환 (프론트에서 디버그 탭에 보여줄 수 있음)
     summary = render_summary(state)
 
-    # 6) 선택: 이미지 업로드와 함께 텍스트까지 들어온 경우 즉시 한 턴 처리
+    # 5) 선택: 이미지 업로드와 함께 텍스트까지 들어온 경우 즉시 한 턴 처리
     text_result: Dict[str, Any] = {}
     combined_text = user_message if user_message is not None else text
     if combined_text is not None:
         stripped = combined_text.strip()
         if stripped:
-            text_result = _run_text_turn(session_id, state, _histories[session_id], stripped)
+            text_result = await _submit(
+                _run_text_turn, session_id, state, history, stripped,
+                _start_query_embedding(stripped),
+                batch_key=session_id,
+            )
 
     return ImageChatResponse(
         session_id=session_id,
@@ -15,30 +15,67 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
 import difflib
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Tuple, Set
+from typing import Any, Dict, FrozenSet, Iterable, List, Tuple, Set
 
 from config import MOOD_VOCAB_PATH
 
+try:
+    # 선택 의존성: 있으면 문장 내 무드 탐지를 한 번의 스캔으로 처리
+    import ahocorasick
+except ImportError:  # 미설치 환경에서는 단순 루프로 동작
+    ahocorasick = None
+
+try:
+    # 선택 의존성: 있으면 유사도 스냅 후보를 C++ 구현으로 먼저 거름 (최종 선택은 difflib)
+    from rapidfuzz import fuzz, process
+except ImportError:
+    fuzz = process = None
+
 
 _MOOD_VOCAB: List[str] | None = None
 _MOOD_SET: Set[str] | None = None
+_VOCAB_TUPLE: Tuple[str, ...] = ()
+# 무드 키워드 → 고정 비트 (1 << 사전 인덱스). 무드 집합 비교를 정수 AND + popcount로 처리
+_MOOD_BIT: Dict[str, int] = {}
+# 사전 내용 지문 (인덱스에 저장한 mood_bits가 지금 사전 기준인지 확인용)
+_VOCAB_VERSION: str = ""
 
+# match_moods_in_text용 Aho-Corasick 오토마톤 + (키워드 → 사전 순위)
+_AC: Any = None
+_MOOD_RANK: Dict[str, int] | None = None
+_AC_LOCK = threading.Lock()
+# 콜드 스타트에 동시에 들어온 요청들이 사전을 중복 로딩하지 않도록
+_LOAD_LOCK = threading.Lock()
 
-def _load_vocab() -> List[str]:
-    """JSON 파일에서 정제된 무드 키워드를 로딩."""
-    global _MOOD_VOCAB, _MOOD_SET  # type: ignore[name-defined]
 
+def _load_vocab() -> List[str]:
+    """
+    JSON 파일에서 정제된 무드 키워드를 로딩 (최초 1회).
+    서버는 시작 시 미리 호출하고, 그 외에는 첫 사용 시 락 안에서 한 번만 로딩한다.
+    """
     if _MOOD_VOCAB is not None:  # type: ignore[name-defined]
         return _MOOD_VOCAB  # type: ignore[name-defined]
 
+    with _LOAD_LOCK:
+        if _MOOD_VOCAB is None:
+            _load_vocab_locked()
+    return _MOOD_VOCAB  # type: ignore[name-defined]
+
+
+def _load_vocab_locked() -> None:
+    global _MOOD_VOCAB, _MOOD_SET, _VOCAB_TUPLE, _MOOD_BIT, _VOCAB_VERSION  # type: ignore[name-defined]
+
     path = Path(MOOD_VOCAB_PATH)
     if not path.is_file():
-        _MOOD_VOCAB = []  # type: ignore[name-defined]
         _MOOD_SET = set()
-        return _MOOD_VOCAB  # type: ignore[name-defined]
+        _MOOD_VOCAB = []  # type: ignore[name-defined]
+        return
 
     with open(path, "r", encoding="utf-8") as f:
         data = json.load(f)
@@ -51,14 +88,24 @@ def _load_vocab() -> List[str]:
         for x in data
         if str(x.get("keyword", "")).strip()
     ]
-    _MOOD_VOCAB = vocab  # type: ignore[name-defined]
+    mood_bit: Dict[str, int] = {}
+    for i, kw in enumerate(vocab):
+        mood_bit.setdefault(kw, 1 << i)
+
     _MOOD_SET = set(vocab)
-    return _MOOD_VOCAB  # type: ignore[name-defined]
+    _VOCAB_TUPLE = tuple(vocab)
+    _MOOD_BIT = mood_bit
+    _VOCAB_VERSION = hashlib.blake2b(
+        "\n".join(vocab).encode("utf-8"), digest_size=8
+    ).hexdigest()
+    # 락 없이 읽는 쪽은 _MOOD_VOCAB만 확인하므로, 나머지를 다 채운 뒤 마지막에 공개
+    _MOOD_VOCAB = vocab  # type: ignore[name-defined]
 
 
-def get_mood_vocab() -> List[str]:
-    """정제된 무드 키워드 리스트."""
-    return list(_load_vocab())
+def get_mood_vocab() -> Tuple[str, ...]:
+    """정제된 무드 키워드 (불변 튜플이라 복사 없이 그대로 반환)."""
+    _load_vocab()
+    return _VOCAB_TUPLE
 
 
 def get_mood_vocab_set() -> Set[str]:
@@ -69,6 +116,72 @@ def get_mood_vocab_set() -> Set[str]:
     return set(_MOOD_SET or [])
 
 
+popcount = int.bit_count
+
+
+def vocab_version() -> str:
+    """현재 무드 사전의 지문 (사전이 바뀌면 비트 배치도 바뀐다)."""
+    _load_vocab()
+    return _VOCAB_VERSION
+
+
+def moods_to_bits(moods: Iterable[str]) -> int:
+    """사전에 있는 무드들을 비트마스크 하나로 (사전에 없는 표현은 무시)."""
+    _load_vocab()
+    bits = 0
+    for m in moods:
+        bits |= _MOOD_BIT.get(m, 0)
+    return bits
+
+
+def mood_bits_and_extras(moods: Iterable[str]) -> Tuple[int, FrozenSet[str]]:
+    """
+    무드 리스트 → (사전 키워드 비트마스크, 사전에 없는 표현 집합).
+    사전 밖 표현은 드물기 때문에 따로 작은 집합으로만 들고 다닌다.
+    """
+    _load_vocab()
+    bits = 0
+    extras: List[str] = []
+    for m in moods:
+        b = _MOOD_BIT.get(m)
+        if b is None:
+            extras.append(m)
+        else:
+            bits |= b
+    return bits, frozenset(extras)
+
+
+@lru_cache(maxsize=8192)
+def _snap_one(s: str, min_similarity: float) -> str | None:
+    """
+    사전에 정확히 없는 표현 하나를 가장 비슷한 사전 키워드로 스냅 (없으면 None).
+    build_index에서 같은 원본 무드가 상품마다 반복되므로 결과를 캐시한다.
+    """
+    if process is not None:
+        # rapidfuzz의 fuzz.ratio(Indel/LCS 기반)는 difflib ratio와 같은 값이 아니라
+        # 항상 그 이상인 상한값이다. 그래서 후보 거르기에만 쓰고, 최종 선택은
+        # 걸러진 후보들에 difflib을 돌려서 정한다. → rapidfuzz 설치 여부와 상관없이
+        # 결과(동점 처리 포함)가 difflib 단독과 똑같다. (인덱스의 mood_bits가 환경마다 달라지지 않음)
+        candidates = [
+            m[0]
+            for m in process.extract(
+                s,
+                _VOCAB_TUPLE,
+                scorer=fuzz.ratio,
+                processor=None,
+                score_cutoff=min_similarity * 100 - 1e-6,  # 부동소수 오차로 경계값을 놓치지 않게
+                limit=None,
+            )
+        ]
+        if not candidates:
+            return None
+    else:
+        candidates = _VOCAB_TUPLE
+
+    match = difflib.get_close_matches(s, candidates, n=1, cutoff=min_similarity)
+    return match[0] if match else None
+
+
 def snap_moods_to_vocab(
     raw_moods: List[str],
     min_similarity: float = 0.72,
@@ -78,14 +191,14 @@ def snap_moods_to_vocab(
 
     Args:
         raw_moods: LLM/VLM/사용자가 준 무드 문자열 리스트
-        min_similarity: difflib 유사도 컷오프 (0~1)
+        min_similarity: 유사도 컷오프 (0~1, difflib ratio 기준)
 
     Returns:
         canonical_moods: 표준 키워드로 정규화된 무드 리스트(중복 제거)
         unknown_moods: 사전 어디에도 매칭 안 된 원래 표현들
     """
-    vocab = get_mood_vocab()
-    vocab_set = get_mood_vocab_set()
+    _load_vocab()
+    vocab_set = _MOOD_SET or set()
 
     canonical: List[str] = []
     unknown: List[str] = []
@@ -104,9 +217,8 @@ def snap_moods_to_vocab(
             continue
 
         # (2) 유사도 매칭 (예: "따뜻한 느낌" → "따뜻한")
-        match = difflib.get_close_matches(s, vocab, n=1, cutoff=min_similarity)
-        if match:
-            cand = match[0]
+        cand = _snap_one(s, min_similarity)
+        if cand is not None:
             if cand not in seen:
                 canonical.append(cand)
                 seen.add(cand)
@@ -116,6 +228,28 @@ def snap_moods_to_vocab(
     return canonical, unknown
 
 
+def _get_automaton() -> Any:
+    """사전 전체를 Aho-Corasick 오토마톤으로 한 번만 컴파일 (pyahocorasick 없으면 None)."""
+    global _AC, _MOOD_RANK
+    if _AC is not None or ahocorasick is None:
+        return _AC
+
+    with _AC_LOCK:
+        if _AC is None:
+            vocab = _load_vocab()
+            rank: Dict[str, int] = {}
+            automaton = ahocorasick.Automaton()
+            for i, kw in enumerate(vocab):
+                if kw and kw not in rank:
+                    rank[kw] = i
+                    automaton.add_word(kw, kw)
+            if rank:
+                automaton.make_automaton()
+            _MOOD_RANK = rank
+            _AC = automaton
+    return _AC
+
+
 def match_moods_in_text(text: str) -> List[str]:
     """
     한글 문장 안에서 사전에 존재하는 무드 키워드를
@@ -123,12 +257,22 @@ def match_moods_in_text(text: str) -> List[str]:
 
     예: "따뜻하고 아늑한 우드톤 방"
       → ["따뜻한", "아늑한", "우드톤"] (사전에 있다면)
+
+    pyahocorasick이 설치되어 있으면 문장을 한 번만 훑어서 모든 키워드를 찾고,
+    결과 순서는 기존과 같이 사전 순서(freq 내림차순)로 맞춘다.
     """
     text = str(text)
     if not text:
         return []
 
-    vocab = get_mood_vocab()
+    automaton = _get_automaton()
+    if automaton is not None:
+        if not _MOOD_RANK:
+            return []
+        hits = {kw for _, kw in automaton.iter(text)}
+        return sorted(hits, key=_MOOD_RANK.__getitem__)
+
+    vocab = _load_vocab()
     found: List[str] = []
     seen = set()
 
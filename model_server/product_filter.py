@@ -15,7 +15,12 @@ RAG로 가져온 상품 후보 리스트에 대해
 
 from __future__ import annotations
 
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import FrozenSet, List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from mood_vocab import mood_bits_and_extras, popcount, vocab_version
 
 
 def _parse_price(price_raw: Any) -> Optional[int]:
@@ -90,38 +95,92 @@ def _budget_filter_and_score(
     return 0.0
 
 
-def _mood_match_score(
-    product_moods: List[str],
-    target_moods: List[str],
-) -> float:
+def _budget_scores(
+    prices: np.ndarray,
+    price_min: Optional[int],
+    price_max: Optional[int],
+) -> np.ndarray:
+    """
+    _budget_filter_and_score의 점수 부분을 배열 단위로 계산.
+    (예산 범위 밖 상품은 이미 걸러진 상태로 들어온다고 가정)
+    """
+    if price_min is None and price_max is None:
+        return np.zeros(prices.shape, dtype=np.float64)
+
+    if price_min is not None and price_max is not None:
+        center = (price_min + price_max) / 2
+        half_range = max((price_max - price_min) / 2, 1)
+        return np.maximum(0.0, 1.0 - np.abs(prices - center) / half_range)
+
+    if price_min is not None:
+        dist = np.maximum(prices - price_min, 0)
+        return 1.0 / (1.0 + dist / max(price_min, 1))
+
+    dist = np.maximum(price_max - prices, 0)
+    return 1.0 / (1.0 + dist / max(price_max, 1))
+
+
+# (사전 키워드 비트마스크, 사전에 없는 표현 집합)
+MoodBits = Tuple[int, FrozenSet[str]]
+
+
+@lru_cache(maxsize=16384)
+def _mood_bits_from_str(moods_raw: str) -> MoodBits:
+    """
+    상품 메타데이터의 무드 문자열("아늑한, 우드톤") → MoodBits.
+    같은 상품(같은 문자열)이 턴마다 반복해서 검색되므로 결과를 캐시한다.
+    """
+    return mood_bits_and_extras(
+        m.strip() for m in moods_raw.replace("/", ",").split(",") if m.strip()
+    )
+
+
+def _product_mood_bits(item: Dict[str, Any], vocab_ver: str) -> MoodBits:
+    """
+    상품 dict의 무드 필드(문자열/리스트)를 MoodBits로.
+    인덱스 생성 시 같은 사전 기준으로 저장해 둔 mood_bits가 있으면 그대로 사용.
+    """
+    bits_hex = item.get("mood_bits")
+    if bits_hex and item.get("mood_vocab_ver") == vocab_ver:
+        return int(bits_hex, 16), frozenset()
+
+    moods_raw = item.get("mood_keywords") or item.get("moods") or []
+    if isinstance(moods_raw, str):
+        return _mood_bits_from_str(moods_raw)
+    if isinstance(moods_raw, list):
+        return mood_bits_and_extras(str(m).strip() for m in moods_raw if m)
+    return 0, frozenset()
+
+
+def _mood_match_score(prod: MoodBits, targ: MoodBits) -> float:
     """
     상품의 mood_keywords와 사용자의 '목표 무드(effective_target_moods)' 간의 매칭 점수.
 
+    prod / targ: (사전 키워드 비트마스크, 사전에 없는 표현 집합)
+    → 교집합 크기는 비트 AND + popcount (+ 사전 밖 표현끼리의 교집합)
+
     - 정확히 일치하는 무드가 많을수록 점수 ↑
     - 완전히 겹치는 게 없어도, 일부라도 겹치면 0.5 정도는 줌
     """
-    if not target_moods:
+    targ_bits, targ_extras = targ
+    targ_n = popcount(targ_bits) + len(targ_extras)
+    if not targ_n:
         return 0.0
-    if not product_moods:
-        return 0.0
-
-    prod_set = set(str(m).strip() for m in product_moods if m)
-    targ_set = set(str(m).strip() for m in target_moods if m)
 
-    if not prod_set or not targ_set:
+    prod_bits, prod_extras = prod
+    prod_n = popcount(prod_bits) + len(prod_extras)
+    if not prod_n:
         return 0.0
 
-    inter = prod_set & targ_set
+    inter = popcount(prod_bits & targ_bits)
+    if prod_extras and targ_extras:
+        inter += len(prod_extras & targ_extras)
     if not inter:
         return 0.0
 
     # 겹치는 비율에 따라 0~1 사이 점수
     # (상품 무드/목표 무드 중 작은 쪽을 기준으로 비율 계산)
-    denom = min(len(prod_set), len(targ_set))
-    if denom <= 0:
-        return 0.0
-
-    base = len(inter) / denom  # 0 ~ 1
+    base = inter / min(prod_n, targ_n)  # 0 ~ 1
     # 살짝 가중치를 준다 (최대 2점)
     return base * 2.0
 
@@ -193,8 +252,12 @@ def filter_and_rank(
         - space
         - price_min, price_max
         - effective_target_moods (property)
-        - last_recommended_ids   (이전에 추천한 상품 id 리스트)
+        - target_mood_bits       (property, 있으면 사용 → 목표 무드 비트마스크)
+        - last_recommended_ids   (이전에 추천한 상품 id 집합)
     """
+    if not products:
+        return []
+
     target_category = getattr(state, "category", None)
     target_space = getattr(state, "space", None)
     price_min = getattr(state, "price_min", None)
@@ -202,74 +265,109 @@ def filter_and_rank(
 
     # 목표 무드: 텍스트로 명시된 target_moods가 있으면 그걸 우선,
     # 없으면 current_moods를 사용하는 effective_target_moods 사용
-    target_moods = getattr(state, "effective_target_moods", []) or []
+    # (ChatState는 버전 기준으로 캐시된 비트마스크를 제공)
+    targ_bits = getattr(state, "target_mood_bits", None)
+    if targ_bits is None:
+        target_moods = getattr(state, "effective_target_moods", []) or []
+        targ_bits = mood_bits_and_extras(str(m).strip() for m in target_moods if m)
+
+    # ChatState는 frozenset으로 들고 있으므로 보통 그대로 사용 (다른 타입일 때만 변환)
+    last_ids = getattr(state, "last_recommended_ids", None) or frozenset()
+    if not isinstance(last_ids, (set, frozenset)):
+        last_ids = frozenset(last_ids)
+
+    # 호출마다 상수인 조건은 미리 판정해서, 점수가 0일 수밖에 없는 항목은 아예 계산하지 않음
+    use_moods = bool(targ_bits[0] or targ_bits[1])
+    target_category = str(target_category) if target_category else None
+    target_space = str(target_space) if target_space else None
+
+    # ---------------------------------------------
+    # 1) 숫자 필드(가격)는 배열로 모아서 한 번에 계산 (가격 없음 = NaN)
+    # ---------------------------------------------
+    # (인덱스에 미리 정수로 저장된 price_int가 있으면 파싱 생략)
+    parsed_prices = [
+        p if type(p := item.get("price_int")) is int else _parse_price(item.get("price"))
+        for item in products
+    ]
+    prices = np.array(
+        [np.nan if p is None else p for p in parsed_prices],
+        dtype=np.float64,
+    )
+    has_price = ~np.isnan(prices)
+
+    # 예산 필터: 범위를 벗어난 상품 제거 (가격 정보가 없으면 통과)
+    keep = np.ones(len(products), dtype=bool)
+    if price_min is not None:
+        keep &= ~(prices < price_min)
+    if price_max is not None:
+        keep &= ~(prices > price_max)
+
+    idx = np.flatnonzero(keep)
+    if idx.size == 0:
+        return []
 
-    last_ids = set(getattr(state, "last_recommended_ids", []) or [])
+    budget_scores = _budget_scores(prices[idx], price_min, price_max)
+    budget_scores[~has_price[idx]] = 0.0
 
-    scored: List[Dict[str, Any]] = []
+    # ---------------------------------------------
+    # 2) 문자열 기반 점수(무드/카테고리/공간)는 예산을 통과한 상품만 계산
+    #    (목표가 없는 항목은 건너뜀: 카테고리 → 무드 → 공간 순으로 싼 것부터)
+    # ---------------------------------------------
+    vocab_ver = vocab_version()
+    text_scores = np.empty(idx.size, dtype=np.float64)
+    penalties = np.zeros(idx.size, dtype=np.float64)
+
+    for j, i in enumerate(idx.tolist()):
+        item = products[i]
 
-    for item in products:
         # ID 중복 방지용
         pid = item.get("product_id") or item.get("id")
-        category_id = item.get("category_id")
-        price_raw = item.get("price")
-        product_price = _parse_price(price_raw)
-
-        # 예산 필터 + 예산 점수
-        budget_score = _budget_filter_and_score(product_price, price_min, price_max)
-        if budget_score is None:
-            # 예산 범위 밖 -> 후보에서 제거
-            continue
-
-        # 상품 무드 필드 정리
-        moods_raw = item.get("mood_keywords") or item.get("moods") or []
-        if isinstance(moods_raw, str):
-            # 쉼표/공백 기준으로 잘라서 리스트로
-            moods = [m.strip() for m in moods_raw.replace("/", ",").split(",") if m.strip()]
-        elif isinstance(moods_raw, list):
-            moods = [str(m).strip() for m in moods_raw if m]
-        else:
-            moods = []
-
-        mood_score = _mood_match_score(moods, target_moods)
-        category_score = _category_match_score(category_id, target_category)
-
-        # 상품 dict 안에 space 관련 필드가 있다면 활용 (없으면 0점)
-        product_space = item.get("space") or item.get("space_ko") or item.get("space_en")
-        space_score = _space_match_score(product_space, target_space)
-
-        # 기본 점수 = 무드 + 카테고리 + 공간 + 예산 적합도
+
+        # 카테고리(최대 2점) + 무드(최대 2점) + 공간(최대 1점)
         score = 0.0
-        score += mood_score          # 최대 2점
-        score += category_score      # 최대 2점
-        score += space_score         # 최대 1점
-        score += budget_score * 1.0  # 최대 1점 정도 비중
-
-        # 가격이 너무 비싸거나 너무 싼 상품에 간단한 페널티(선택 사항)
-        # (예: 예산 범위가 없을 때 극단값을 약간 깎기)
-        if price_min is None and price_max is None and product_price is not None:
-            # 0 ~ 1 사이로 노멀라이즈하는 대신, 너무 큰 값에는 ln 스케일 같은 걸 써도 된다.
-            # 여기서는 단순히 "존재하면 살짝 보너스" 정도만 준다.
-            score += 0.1
+        if target_category:
+            score += _category_match_score(item.get("category_id"), target_category)
+        if use_moods:
+            score += _mood_match_score(_product_mood_bits(item, vocab_ver), targ_bits)
+        if target_space:
+            # 상품 dict 안에 space 관련 필드가 있다면 활용 (없으면 0점)
+            product_space = item.get("space") or item.get("space_ko") or item.get("space_en")
+            score += _space_match_score(product_space, target_space)
+        text_scores[j] = score
 
         # 이미 지난 턴에 추천했던 상품이면 약간 페널티
         if pid and pid in last_ids:
-            score -= 1.0
+            penalties[j] = 1.0
 
-        # 점수가 동일할 때 가격이 싼 제품을 약간 더 선호하고 싶다면
-        # 가격이 낮을수록 살짝 보너스
-        if product_price is not None:
-            score += 0.000001 * (-product_price)
+    # ---------------------------------------------
+    # 3) 최종 점수 = 무드 + 카테고리 + 공간 + 예산 적합도 (+ 보너스/페널티)
+    # ---------------------------------------------
+    kept_has_price = has_price[idx]
+    kept_prices = prices[idx]
 
-        # 계산된 점수를 item에 기록해 둠 (디버깅/로깅 용도)
-        item_with_score = dict(item)
-        item_with_score["_score"] = score
+    scores = text_scores + budget_scores * 1.0  # 예산은 최대 1점 정도 비중
 
-        scored.append(item_with_score)
+    # 예산 범위가 없을 때는 가격 정보가 있는 상품에 살짝 보너스
+    if price_min is None and price_max is None:
+        scores = np.where(kept_has_price, scores + 0.1, scores)
+
+    scores = scores - penalties
+
+    # 점수가 동일할 때 가격이 싼 제품을 약간 더 선호하도록
+    # 가격이 낮을수록 살짝 보너스
+    scores = np.where(kept_has_price, scores + 0.000001 * -kept_prices, scores)
 
-    # 점수 높은 순으로 정렬
-    # (동점일 경우, 위에서 price 보너스를 음수로 반영했기 때문에
+    # 점수 높은 순으로 정렬 (동점이면 원래 검색 순서 유지)
+    # (위에서 price 보너스를 음수로 반영했기 때문에
     #  사실상 "점수 같으면 더 싼 상품이 먼저"가 된다.)
-    scored.sort(key=lambda x: x.get("_score", 0.0), reverse=True)
+    order = np.argsort(-scores, kind="stable")
+
+    # 계산된 점수를 item 복사본에 기록해 둠 (디버깅/로깅 용도)
+    # (원본 인덱스/점수를 정렬 순서대로 한 번에 파이썬 값으로 꺼내서 사용)
+    ranked: List[Dict[str, Any]] = []
+    for i, score in zip(idx[order].tolist(), scores[order].tolist()):
+        item_with_score = dict(products[i])
+        item_with_score["_score"] = score
+        ranked.append(item_with_score)
 
-    return scored
+    return ranked
@@ -4,29 +4,41 @@ products_all_ver1_vlm.json → Chroma VectorDB 인덱싱 스크립트 (OpenAI Em
 
 - 한 상품당 하나의 document
 - 무드 키워드 / 카테고리 / 가격 / 브랜드 등 메타데이터 저장
-- 임베딩: OpenAI text-embedding-3-large (config.EMBEDDING_MODEL_NAME)
+- 임베딩: OpenAI text-embedding-3 계열 (config.EMBEDDING_MODEL_NAME / EMBEDDING_DIMENSIONS)
 
 ⚠️ 주의:
   - build_vector_db.py와 동일하게 'products' 컬렉션을 생성한다.
   - 이 파일을 실행하면 기존 'products' 컬렉션을 삭제하고 다시 만든다.
 """
 
+import asyncio
 import json
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Union
 
 import chromadb
+import httpx
+import numpy as np
 from chromadb.config import Settings
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 from config import (
     PRODUCTS_JSON_PATH,
     VECTOR_DB_DIR,
     EMBEDDING_MODEL_NAME,
+    EMBEDDING_DIMENSIONS,
+    SEMANTIC_CACHE_EMBED_TIMEOUT,
+    EMBED_BATCH_WINDOW_MS,
+    EMBED_MAX_BATCH,
+    OPENAI_MAX_RETRIES,
+    OPENAI_MAX_CONCURRENCY,
 )
 
 # 🔹 무드 정규화 유틸 (mood_vocab.py)
-from mood_vocab import snap_moods_to_vocab
+from mood_vocab import snap_moods_to_vocab, mood_bits_and_extras, vocab_version
+from result_cache import make_key, open_vector_cache
 
 
 # =========================
@@ -34,25 +46,258 @@ from mood_vocab import snap_moods_to_vocab
 # =========================
 
 _client: OpenAI | None = None
+_async_client: AsyncOpenAI | None = None
+# 응답 캐시 조회용: 짧은 타임아웃 + 재시도 없음 (느리면 캐시 없이 그냥 진행하도록)
+_quick_client: OpenAI | None = None
+
+# 임베딩 요청은 같은 호스트로만 가므로 커넥션 풀 하나를 계속 재사용 (keep-alive)
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+_HTTP_TIMEOUT = 60.0
+
+# 스레드에서 동시에 나가는 임베딩 요청 수 상한 (넘으면 앞 요청이 끝날 때까지 대기 → 429 예방)
+_EMBED_SEM = threading.BoundedSemaphore(max(1, OPENAI_MAX_CONCURRENCY))
 
 
 def _get_client() -> OpenAI:
     global _client
     if _client is None:
-        _client = OpenAI()  # OPENAI_API_KEY는 .env / 환경변수에서 읽음
+        # OPENAI_API_KEY는 .env / 환경변수에서 읽음
+        _client = OpenAI(
+            http_client=httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT),
+            max_retries=OPENAI_MAX_RETRIES,
+        )
     return _client
 
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
+def get_openai_client() -> OpenAI:
+    """프로세스 공유 OpenAI 클라이언트 (다른 모듈의 API 호출도 같은 커넥션 풀을 쓰도록)."""
+    return _get_client()
+
+
+def _get_async_client() -> AsyncOpenAI:
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI(
+            http_client=httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT),
+            max_retries=OPENAI_MAX_RETRIES,
+        )
+    return _async_client
+
+
+async def close_clients() -> None:
+    """공유 OpenAI 클라이언트의 커넥션 풀을 닫는다 (서버 종료 / 인덱싱 끝)."""
+    global _client, _async_client, _quick_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+    if _client is not None:
+        _client.close()
+        _client = None
+    if _quick_client is not None:
+        _quick_client.close()
+        _quick_client = None
+
+
+# (모델, 텍스트) → 임베딩 디스크 캐시. 같은 문장은 다시 API를 부르지 않는다.
+# (재인덱싱 시 바뀌지 않은 상품, 반복되는 사용자 문장 등)
+_emb_cache = open_vector_cache("embeddings")
+
+# 임베딩 한 개: 캐시 히트는 float32 ndarray(LMDB) 또는 list(sqlite), API 결과는 list
+Vector = Union[List[float], np.ndarray]
+
+
+def _emb_key(text: str) -> str:
+    """임베딩 캐시 키 (모델/차원이 바뀌면 다른 키 → 예전 벡터와 섞이지 않음)."""
+    return make_key(EMBEDDING_MODEL_NAME, EMBEDDING_DIMENSIONS, text)
+
+
+def _lookup_cached(
+    texts: List[str],
+) -> Tuple[List[str], Dict[str, Any], List[str], List[str]]:
     """
-    OpenAI text-embedding-3-large로 여러 문장을 임베딩.
+    texts → (전체 키, 캐시 히트 {키: 임베딩}, 미스 키, 미스 텍스트).
+    미스는 중복 없이 처음 등장한 순서대로.
     """
-    client = _get_client()
-    resp = client.embeddings.create(
-        model=EMBEDDING_MODEL_NAME,
-        input=texts,
-    )
-    return [d.embedding for d in resp.data]
+    keys = [_emb_key(t) for t in texts]
+    cached = _emb_cache.get_many(list(set(keys)))
+
+    miss_keys: List[str] = []
+    miss_texts: List[str] = []
+    seen = set(cached)
+    for key, text in zip(keys, texts):
+        if key not in seen:
+            seen.add(key)
+            miss_keys.append(key)
+            miss_texts.append(text)
+    return keys, cached, miss_keys, miss_texts
+
+
+def embed_texts(texts: List[str]) -> List[Vector]:
+    """
+    OpenAI 임베딩 모델(EMBEDDING_MODEL_NAME, EMBEDDING_DIMENSIONS차원)로 여러 문장을 임베딩.
+    캐시에 없는 문장만 모아서 한 번에 API를 호출하고, 결과는 입력 순서대로 반환.
+    """
+    keys, cached, miss_keys, miss_texts = _lookup_cached(texts)
+
+    if miss_texts:
+        client = _get_client()
+        with _EMBED_SEM:
+            resp = client.embeddings.create(
+                model=EMBEDDING_MODEL_NAME,
+                input=miss_texts,
+                dimensions=EMBEDDING_DIMENSIONS,
+            )
+        new_items = list(zip(miss_keys, (d.embedding for d in resp.data)))
+        _emb_cache.set_many(new_items)
+        cached.update(new_items)
+
+    return [cached[key] for key in keys]
+
+
+def _get_quick_client() -> OpenAI:
+    global _quick_client
+    if _quick_client is None:
+        _quick_client = OpenAI(
+            http_client=httpx.Client(timeout=SEMANTIC_CACHE_EMBED_TIMEOUT),
+            max_retries=0,
+        )
+    return _quick_client
+
+
+def embed_text_quick(text: str) -> Vector:
+    """
+    문장 하나 임베딩 (응답 캐시 조회용).
+    SEMANTIC_CACHE_EMBED_TIMEOUT 안에 답이 없으면 재시도 없이 바로 예외 → 호출 측에서 캐시 생략.
+    """
+    key = _emb_key(text)
+    hit = _emb_cache.get(key)
+    if hit is not None:
+        return hit
+
+    with _EMBED_SEM:
+        resp = _get_quick_client().embeddings.create(
+            model=EMBEDDING_MODEL_NAME,
+            input=[text],
+            dimensions=EMBEDDING_DIMENSIONS,
+        )
+    emb = resp.data[0].embedding
+    _emb_cache.set_many([(key, emb)])
+    return emb
+
+
+class _EmbedRequest:
+    __slots__ = ("text", "done", "result", "error")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.done = threading.Event()
+        self.result: Optional[Vector] = None
+        self.error: Optional[BaseException] = None
+
+
+class _EmbedBatcher:
+    """
+    여러 스레드에서 거의 동시에 들어온 단건 임베딩 요청을 모아 한 번의 embed_texts로 처리한다.
+    (llm_core._GenerateBatcher와 같은 리더 방식)
+
+    - 그룹의 첫 요청(리더)이 window 동안 기다리며 다른 요청을 모은다.
+    - 나머지 요청은 리더가 결과를 채워 줄 때까지 대기한다.
+    - 디스크 캐시에 이미 있는 문장은 기다리지 않고 바로 반환한다.
+    """
+
+    def __init__(self, window_sec: float, max_batch: int):
+        self.window_sec = window_sec
+        self.max_batch = max(1, max_batch)
+        self._lock = threading.Lock()
+        self._pending: List[_EmbedRequest] = []
+
+    def embed(self, text: str) -> Vector:
+        hit = _emb_cache.get(_emb_key(text))
+        if hit is not None:
+            return hit
+
+        req = _EmbedRequest(text)
+        with self._lock:
+            self._pending.append(req)
+            is_leader = len(self._pending) == 1
+
+        if is_leader:
+            if self.window_sec > 0:
+                time.sleep(self.window_sec)
+            with self._lock:
+                batch, self._pending = self._pending, []
+            for i in range(0, len(batch), self.max_batch):
+                self._run(batch[i : i + self.max_batch])
+        else:
+            req.done.wait()
+
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    @staticmethod
+    def _run(batch: List[_EmbedRequest]) -> None:
+        try:
+            vectors = embed_texts([r.text for r in batch])
+            for r, vec in zip(batch, vectors):
+                r.result = vec
+        except BaseException as e:
+            for r in batch:
+                r.error = e
+        finally:
+            for r in batch:
+                r.done.set()
+
+
+_embed_batcher = _EmbedBatcher(EMBED_BATCH_WINDOW_MS / 1000.0, EMBED_MAX_BATCH)
+
+
+def embed_text_batched(text: str) -> Vector:
+    """
+    검색 쿼리 한 문장 임베딩. 동시에 들어온 다른 스레드의 요청과 묶어서 API를 한 번만 호출.
+    """
+    return _embed_batcher.embed(text)
+
+
+async def embed_texts_async(
+    texts: List[str],
+    batch_size: int = 128,
+    concurrency: int = 16,
+) -> List[Vector]:
+    """
+    embed_texts의 대량 버전 (인덱싱용).
+    캐시 미스만 batch_size 단위로 나눠서 최대 concurrency개 요청을 동시에 보낸다.
+    결과는 입력 순서대로 반환.
+    """
+    keys, cached, miss_keys, miss_texts = _lookup_cached(texts)
+
+    if miss_texts:
+        client = _get_async_client()
+        sem = asyncio.Semaphore(max(1, min(concurrency, OPENAI_MAX_CONCURRENCY)))
+        total = len(miss_texts)
+        done = 0
+
+        async def _one(start: int) -> None:
+            nonlocal done
+            batch_texts = miss_texts[start : start + batch_size]
+            async with sem:
+                resp = await client.embeddings.create(
+                    model=EMBEDDING_MODEL_NAME,
+                    input=batch_texts,
+                    dimensions=EMBEDDING_DIMENSIONS,
+                )
+            new_items = list(zip(
+                miss_keys[start : start + batch_size],
+                (d.embedding for d in resp.data),
+            ))
+            _emb_cache.set_many(new_items)
+            cached.update(new_items)
+            done += len(batch_texts)
+            print(f"  - {done}/{total}개 완료")
+
+        await asyncio.gather(*(_one(i) for i in range(0, total, batch_size)))
+
+    return [cached[key] for key in keys]
 
 
 # =========================
@@ -61,12 +306,67 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
 
 COLLECTION_NAME = "products"
 
+# HNSW 파라미터: 빌드는 조금 느려지는 대신 검색 recall/지연이 좋아짐
+# (search_ef: 검색 시 탐색 후보 수. top_k=20 기준 64면 recall과 지연의 균형이 좋음)
+HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:construction_ef": 200,
+    "hnsw:M": 32,
+    "hnsw:search_ef": 64,
+}
+
+# collection.add 한 번에 넣는 상품 수 (임베딩과 Chroma 추가를 이 단위로 겹쳐서 진행)
+ADD_BATCH_SIZE = 1024
+
+
+async def _embed_and_add(
+    collection: Any,
+    ids: List[str],
+    docs: List[str],
+    metadatas: List[Dict[str, Any]],
+) -> int:
+    """
+    ADD_BATCH_SIZE 단위로 임베딩(생산자) → collection.add(소비자, 스레드)를 파이프라인으로 처리.
+    다음 배치를 임베딩하는 동안 이전 배치를 Chroma에 넣는다. 추가한 개수를 반환.
+    """
+    queue: "asyncio.Queue[Tuple[int, np.ndarray] | None]" = asyncio.Queue(maxsize=4)
+    added = 0
+
+    async def _producer() -> None:
+        for start in range(0, len(docs), ADD_BATCH_SIZE):
+            emb = await embed_texts_async(docs[start : start + ADD_BATCH_SIZE])
+            # 연속된 float32 행렬로 넘겨서 Chroma가 원소별로 변환하지 않게 함
+            await queue.put((start, np.asarray(emb, dtype=np.float32)))
+        await queue.put(None)
+
+    async def _consumer() -> None:
+        nonlocal added
+        while (item := await queue.get()) is not None:
+            start, emb = item
+            end = start + len(emb)
+            await asyncio.to_thread(
+                collection.add,
+                ids=ids[start:end],
+                documents=docs[start:end],
+                embeddings=emb,
+                metadatas=metadatas[start:end],
+            )
+            added = end
+            print(f"  - Chroma 추가 {added}/{len(ids)}개")
+
+    try:
+        await asyncio.gather(_producer(), _consumer())
+    finally:
+        # AsyncClient는 이벤트 루프에 묶이므로 같은 루프 안에서 닫는다
+        await close_clients()
+    return added
+
 
 def build_index():
     print("▶ RAG 인덱싱 시작 (OpenAI Embeddings)")
     print(f"  - JSON: {PRODUCTS_JSON_PATH}")
     print(f"  - Vector DB: {VECTOR_DB_DIR}")
-    print(f"  - EMBEDDING_MODEL: {EMBEDDING_MODEL_NAME}")
+    print(f"  - EMBEDDING_MODEL: {EMBEDDING_MODEL_NAME} ({EMBEDDING_DIMENSIONS}차원)")
 
     # 경로 생성
     VECTOR_DB_DIR.mkdir(parents=True, exist_ok=True)
@@ -86,7 +386,7 @@ def build_index():
 
     collection = client.get_or_create_collection(
         name=COLLECTION_NAME,
-        metadata={"hnsw:space": "cosine"},
+        metadata=HNSW_METADATA,
     )
 
     # JSON 로드
@@ -101,6 +401,7 @@ def build_index():
 
     seen_ids = set()
     skipped_duplicates = 0
+    mood_vocab_ver = vocab_version()
 
     for p in products:
         product_id = p.get("product_id")
@@ -153,6 +454,11 @@ def build_index():
         raw_moods_str = ", ".join(raw_mood_list) if raw_mood_list else ""
         unknown_moods_str = ", ".join(unknown_moods) if unknown_moods else ""
 
+        # 🔹 랭킹(filter_and_rank)에서 바로 쓰도록 무드 비트마스크를 미리 계산
+        #    (사전 밖 표현이 섞인 상품은 런타임 파싱으로 처리하도록 비워 둠)
+        mood_bits, mood_extras = mood_bits_and_extras(canonical_moods or raw_mood_list)
+        mood_bits_hex = format(mood_bits, "x") if mood_bits and not mood_extras else ""
+
         # 임베딩용 텍스트 구성
         text_parts = [
             f"[카테고리] {category_id}",
@@ -173,13 +479,21 @@ def build_index():
                 "category_id": category_id,
                 "brand_name": brand_name,
                 "price": price_int,
+                "price_int": price_int,
                 # 🔹 RAG 검색에서 사용할 표준화된 무드 (문자열)
                 "mood_keywords": canonical_moods_str or raw_moods_str,
+                # 🔹 같은 무드의 리스트 버전 (JSON 문자열 → 검색 시 파싱 없이 json.loads 한 번)
+                "mood_keywords_json": json.dumps(
+                    canonical_moods or raw_mood_list, ensure_ascii=False
+                ),
                 "mood_keywords_count": len(canonical_moods or raw_mood_list),
                 # 🔹 원본 JSON에 있던 무드 (로우 데이터 보존, 문자열)
                 "raw_mood_keywords": raw_moods_str,
                 # 🔹 vocab에 매칭되지 않은 무드들(분석/디버깅용, 문자열)
                 "unknown_mood_keywords": unknown_moods_str,
+                # 🔹 mood_keywords의 사전 비트마스크(16진수 문자열, int64 범위를 넘을 수 있음)
+                "mood_bits": mood_bits_hex,
+                "mood_vocab_ver": mood_vocab_ver,
                 "link_url": p.get("link_url", ""),
                 "image_url": p.get("image_url", ""),
                 "s3_path": p.get("s3_path", ""),
@@ -193,24 +507,9 @@ def build_index():
     if skipped_duplicates > 0:
         print(f"  - 중복 product_id로 인해 스킵된 개수: {skipped_duplicates}개")
 
-    print("🧠 임베딩 계산 중... (OpenAI API)")
-    embeddings: List[List[float]] = []
-    BATCH_SIZE = 128
-    total = len(docs)
-
-    for i in range(0, total, BATCH_SIZE):
-        batch_docs = docs[i : i + BATCH_SIZE]
-        batch_embs = embed_texts(batch_docs)
-        embeddings.extend(batch_embs)
-        print(f"  - {i + len(batch_docs)}/{total}개 완료")
-
-    print("💾 Chroma 컬렉션에 추가 중...")
-    collection.add(
-        ids=ids,
-        documents=docs,
-        embeddings=embeddings,
-        metadatas=metadatas,
-    )
+    print("🧠 임베딩 계산 + 💾 Chroma 컬렉션 추가 중... (OpenAI API 배치 병렬 요청)")
+    added = asyncio.run(_embed_and_add(collection, ids, docs, metadatas))
+    print(f"  - 총 {added}개 추가 완료 (임베딩 캐시 포함)")
 
     print("✅ 인덱싱 완료!")
 
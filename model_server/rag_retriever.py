@@ -1,71 +1,220 @@
 """
 rag_retriever.py
 
-ChromaDB 기반 RAG 검색기 (OpenAI text-embedding-3-large 버전)
+ChromaDB 기반 RAG 검색기 (OpenAI text-embedding-3 임베딩 버전)
 
 - OpenAI Embedding API로 쿼리 임베딩 생성
+  (메모리 LRU → 디스크 캐시(rag_index의 임베딩 캐시) → API 순으로 조회)
+- 검색 문장이 이전 검색과 거의 같으면(코사인 유사도 ≥ 임계값) Chroma 결과를 재사용
 - ChromaDB에서 top_k 검색
 - metadata 필터(category_id 등)도 where로 줄 수 있음
 - distance(코사인 거리) → sim_score(0~1)로 변환해서 메타데이터에 포함
 
 설계 포인트:
-- search()에서는 카테고리로 where 필터를 걸지 않고,
-  전체에서 벡터 검색한 뒤 product_filter.filter_and_rank()에서
+- search()는 예산과 (DB 값으로 확실히 매핑되는) 카테고리만 where로 미리 걸고,
+  나머지는 product_filter.filter_and_rank()에서
   카테고리/무드/가격을 기반으로 rerank 한다.
 """
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
 
 import chromadb
+import numpy as np
 from chromadb.config import Settings
-from openai import OpenAI
 
-from config import EMBEDDING_MODEL_NAME, VECTOR_DB_PATH, RAG_TOP_K
+from config import (
+    CATEGORY_ALIAS_PATH,
+    CHROMA_MAX_CONCURRENCY,
+    PRODUCTS_JSON_PATH,
+    VECTOR_DB_PATH,
+    RAG_TOP_K,
+    RAG_WHERE_FILTER_ENABLED,
+    RAG_RESULT_CACHE_ENABLED,
+    RAG_RESULT_CACHE_THRESHOLD,
+    RAG_RESULT_CACHE_TTL,
+    RAG_RESULT_CACHE_MAX_ENTRIES,
+)
+from _row_finalize import finalize_row as _finalize_row  # mypyc로 빌드했으면 .so가 import 됨
+from rag_index import embed_text_batched
+from semantic_cache import SmartRAGCache
 
 
 # rag_index.py / build_vector_db.py에서 생성한 경로와 동일해야 함
 CHROMA_DIR = VECTOR_DB_PATH
 COLLECTION_NAME = "products"  # rag_index.py에서 생성한 이름과 동일해야 함
 
+# 공유 컬렉션에 동시에 들어가는 검색 수 상한 (HNSW 캐시를 서로 밀어내지 않도록)
+_CHROMA_SEM = threading.BoundedSemaphore(max(1, CHROMA_MAX_CONCURRENCY))
+
+
+@lru_cache(maxsize=1)
+def _get_collection() -> Any:
+    """
+    Chroma PersistentClient + 'products' 컬렉션 핸들을 프로세스당 한 번만 연다.
+    (읽기 전용으로 여러 스레드/RAGRetriever 인스턴스가 공유)
+    """
+    client = chromadb.PersistentClient(
+        path=CHROMA_DIR,
+        settings=Settings(anonymized_telemetry=False),
+    )
+    collection = client.get_collection(name=COLLECTION_NAME)
+    _warm_collection(collection)
+    return collection
+
+
+def _warm_collection(collection: Any) -> None:
+    """
+    저장된 벡터 하나로 더미 검색을 한 번 돌려서 HNSW 인덱스를 메모리에 올려 둔다.
+    (첫 사용자 검색이 디스크 로딩 비용을 내지 않도록. 실패해도 검색에는 영향 없음)
+    """
+    try:
+        sample = collection.get(limit=1, include=["embeddings"])
+        embeddings = sample.get("embeddings")
+        if embeddings is not None and len(embeddings):
+            collection.query(query_embeddings=[embeddings[0]], n_results=1, include=[])
+    except Exception:
+        pass
+
+
+@lru_cache(maxsize=1024)
+def _cached_query_embedding(text: str) -> np.ndarray:
+    """
+    같은 검색 문장은 프로세스 안에서 바로 재사용 (읽기 전용 float32 배열로 보관).
+    메모리에 없으면 디스크 캐시(모델+문장 키)를 먼저 보고, 그래도 없을 때만
+    OpenAI API를 호출한다. (동시에 들어온 다른 검색과 한 번의 요청으로 묶임)
+    """
+    vec = np.asarray(embed_text_batched(text), dtype=np.float32)
+    vec.flags.writeable = False  # 캐시를 여러 호출이 공유하므로 수정 금지
+    return vec
+
+
+# 검색 결과 캐시: (검색 문장 임베딩, top_k/필터) → 정리된 결과 리스트
+# (상품 데이터가 바뀌어도 TTL이 지나면 자연히 새로 검색)
+_result_cache: Optional[SmartRAGCache] = (
+    SmartRAGCache(
+        threshold=RAG_RESULT_CACHE_THRESHOLD,
+        ttl=RAG_RESULT_CACHE_TTL,
+        max_entries=RAG_RESULT_CACHE_MAX_ENTRIES,
+    )
+    if RAG_RESULT_CACHE_ENABLED
+    else None
+)
+
+
+def _distances_to_sims(distances: List[Any]) -> List[float]:
+    """
+    distance(코사인 거리) 리스트 → 유사도(0~1) 리스트 (cosine distance이므로 1 - dist).
+    배열 한 번으로 계산하고, 숫자가 아닌 값이 섞여 있을 때만 행 단위로 처리(→ 0.0).
+    """
+    try:
+        dists = np.asarray(distances, dtype=np.float64)
+    except (TypeError, ValueError):
+        dists = None
+    # (None은 NaN으로 바뀌므로 NaN이 있으면 기존 행 단위 규칙을 그대로 적용)
+    if dists is not None and not np.isnan(dists).any():
+        return np.clip(1.0 - dists, 0.0, 1.0).tolist()
+
+    sims = []
+    for d in distances:
+        try:
+            sims.append(max(0.0, min(1.0, 1.0 - float(d))))
+        except Exception:
+            sims.append(0.0)
+    return sims
+
+
+@lru_cache(maxsize=1)
+def _category_lookup() -> Dict[str, str]:
+    """
+    사용자/LLM 카테고리 표현 → DB에 실제로 있는 category_id.
+    - 상품 JSON의 category_id 값은 그대로 자기 자신으로
+    - category_aliases.json이 있으면 그 매핑도 추가 (DB에 있는 값으로 가는 것만)
+    """
+    known: Dict[str, str] = {}
+    try:
+        with open(PRODUCTS_JSON_PATH, "r", encoding="utf-8") as f:
+            for p in json.load(f):
+                cid = p.get("category_id")
+                if cid:
+                    known[str(cid)] = str(cid)
+    except Exception:
+        return {}
+
+    alias_path = Path(CATEGORY_ALIAS_PATH)
+    if alias_path.is_file():
+        with open(alias_path, "r", encoding="utf-8") as f:
+            for alias, cid in json.load(f).items():
+                if str(cid) in known:
+                    known.setdefault(str(alias), str(cid))
+    return known
+
+
+def _build_where(state: Optional[Any]) -> Optional[Dict[str, Any]]:
+    """
+    state → Chroma where 필터 (걸 조건이 없으면 None).
+    - 예산: filter_and_rank와 같은 기준 (price_min 이상, price_max 이하)
+    - 카테고리: DB category_id로 확실히 매핑될 때만 (애매하면 필터 없이 rerank에 맡김)
+    """
+    if state is None:
+        return None
+
+    clauses: List[Dict[str, Any]] = []
+
+    category = getattr(state, "category", None)
+    if category:
+        cid = _category_lookup().get(str(category))
+        if cid:
+            clauses.append({"category_id": cid})
+
+    price_min = getattr(state, "price_min", None)
+    if price_min is not None:
+        clauses.append({"price": {"$gte": price_min}})
+    price_max = getattr(state, "price_max", None)
+    if price_max is not None:
+        clauses.append({"price": {"$lte": price_max}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _copy_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """캐시에 보관된 리스트가 호출부에서 수정되지 않도록 얕은 복사본으로 반환."""
+    return [dict(m) for m in results]
+
 
 class RAGRetriever:
     """
     - 초기화 시:
-        · Chroma PersistentClient + 'products' 컬렉션 로딩
-        · OpenAI 임베딩 클라이언트 준비
+        · Chroma PersistentClient + 'products' 컬렉션 로딩 (프로세스당 1회, 인스턴스끼리 공유)
+        · 쿼리 임베딩은 rag_index.embed_text_batched(공유 OpenAI 클라이언트 + 디스크 캐시) 사용
     - 주요 메서드:
         · query(query_text, filters=None, top_k=...)  → 로우 레벨
         · search(query_text, state=None, top_k=None) → main.py에서 쓰는 하이 레벨
+        · aquery / asearch / asearch_many            → 비동기 버전 (여러 검색을 동시에)
     """
 
     def __init__(self):
-        # 1) Chroma 클라이언트
-        self.client = chromadb.PersistentClient(
-            path=CHROMA_DIR,
-            settings=Settings(anonymized_telemetry=False),
-        )
-
-        # 2) 컬렉션 로드
-        self.collection = self.client.get_collection(name=COLLECTION_NAME)
-
-        # 3) OpenAI 클라이언트 (임베딩용)
-        self.embedding_client = OpenAI()  # OPENAI_API_KEY는 .env / 환경변수에서 읽음
+        # Chroma 클라이언트 + 컬렉션 (프로세스 공유 핸들)
+        self.collection = _get_collection()
 
     # ========================================================
     # 1. 쿼리 임베딩
     # ========================================================
 
-    def _embed_query(self, text: str) -> List[float]:
+    def _embed_query(self, text: str) -> np.ndarray:
         """
-        OpenAI text-embedding-3-large로 쿼리 임베딩 생성.
+        OpenAI 임베딩 모델(config.EMBEDDING_MODEL_NAME)로 쿼리 임베딩 생성 (캐시 우선).
+        float32 배열 그대로 Chroma에 넘겨서 파이썬 float 리스트 변환을 생략한다.
         """
-        resp = self.embedding_client.embeddings.create(
-            model=EMBEDDING_MODEL_NAME,
-            input=[text],
-        )
-        return resp.data[0].embedding
+        return _cached_query_embedding(text)
 
     # ========================================================
     # 2. 로우 레벨 query
@@ -85,75 +234,45 @@ class RAGRetriever:
         return: [metadata(dict), metadata(dict), ...]
                 각 dict 안에는 sim_score(0~1) 추가
         """
+        where = filters if filters else None
+
+        # 0) 같은 top_k/필터로 거의 같은 문장을 검색한 적이 있으면 그 결과를 재사용
+        cache_ns = ""
+        if _result_cache is not None:
+            cache_ns = json.dumps([top_k, where], sort_keys=True, ensure_ascii=False)
+            hit = _result_cache.get_exact(query_text, cache_ns)
+            if hit is not None:
+                return _copy_results(hit["results"])
+
         # 1) 쿼리 문장을 임베딩
         query_vec = self._embed_query(query_text)
 
-        where = filters if filters else None
+        if _result_cache is not None:
+            hit = _result_cache.lookup(query_vec, cache_ns)
+            if hit is not None:
+                return _copy_results(hit["results"])
 
         # 2) 거리 정보까지 함께 가져오기
-        results = self.collection.query(
-            query_embeddings=[query_vec],
-            n_results=top_k,
-            where=where,
-            include=["metadatas", "distances"],
-        )
+        with _CHROMA_SEM:
+            results = self.collection.query(
+                query_embeddings=query_vec[np.newaxis, :],
+                n_results=top_k,
+                where=where,
+                include=["metadatas", "distances"],
+            )
 
         metadatas_list = results.get("metadatas", [[]])[0]
         distances_list = results.get("distances", [[]])[0]
 
-        cleaned: List[Dict[str, Any]] = []
-
-        for m, d in zip(metadatas_list, distances_list):
-            if not m:
-                continue
-
-            item = dict(m)
-
-            # distance(코사인 거리) → 유사도(0~1)로 변환
-            try:
-                dist = float(d)
-                sim = 1.0 - dist  # cosine distance이므로 1 - dist
-                sim = max(0.0, min(1.0, sim))
-            except Exception:
-                sim = 0.0
-
-            item["sim_score"] = round(sim, 4)
-
-            # price 정수 변환 시도
-            if "price" in item:
-                try:
-                    item["price"] = int(item["price"])
-                except Exception:
-                    try:
-                        s = str(item["price"]).replace(",", "").strip()
-                        item["price"] = int(s)
-                    except Exception:
-                        # 실패하면 그대로 둔다
-                        pass
-
-            # mood_keywords 정규화 (문자열 → 리스트)
-            if "mood_keywords" in item:
-                if isinstance(item["mood_keywords"], str):
-                    raw = item["mood_keywords"]
-                    # 혹시 모를 괄호/따옴표 정리
-                    raw = (
-                        raw.replace("[", "")
-                        .replace("]", "")
-                        .replace("'", "")
-                    )
-                    item["mood_keywords"] = [
-                        p.strip()
-                        for p in raw.split(",")
-                        if p.strip()
-                    ]
-                elif isinstance(item["mood_keywords"], list):
-                    item["mood_keywords"] = [
-                        str(p).strip()
-                        for p in item["mood_keywords"]
-                        if str(p).strip()
-                    ]
-
-            cleaned.append(item)
+        sims = _distances_to_sims(distances_list)
+        cleaned = [
+            _finalize_row(m, sim)
+            for m, sim in zip(metadatas_list, sims)
+            if m
+        ]
+
+        if _result_cache is not None:
+            _result_cache.store(query_text, query_vec, cache_ns, {"results": _copy_results(cleaned)})
 
         return cleaned
 
@@ -182,24 +301,66 @@ class RAGRetriever:
         if top_k is None:
             top_k = RAG_TOP_K
 
-        # ⚠️ 카테고리 필터는 여기서 걸지 않는다.
+        # ⚠️ 카테고리는 DB의 category_id로 확실히 매핑될 때만 where로 건다.
         # - LLM이 "lighting" 같은 애매한 값을 줄 때,
         #   Chroma 메타데이터의 "category_id" (예: "조명", "러그_커튼")와
         #   안 맞아서 결과가 0개 나오는 문제가 있었음.
-        # - 대신 전체에서 벡터 검색을 하고,
+        # - 매핑이 안 되는 값은 필터 없이 전체에서 벡터 검색을 하고,
         #   product_filter.filter_and_rank()에서 카테고리/무드/가격으로 재랭크한다.
-        #
-        # 필요하다면 나중에 다음처럼 다시 활성화할 수 있음:
-        # filters = {}
-        # if state is not None and getattr(state, "category", None):
-        #     filters["category_id"] = state.category
-        # return self.query(query_text, filters=filters or None, top_k=top_k)
+        # - 예산은 filter_and_rank와 같은 기준이라 미리 걸어도 최종 결과 후보만 늘어난다.
+        # 필터를 걸었는데 결과가 0개면 필터 없이 다시 검색한다.
+        if RAG_WHERE_FILTER_ENABLED:
+            where = _build_where(state)
+            if where is not None:
+                results = self.query(query_text, filters=where, top_k=top_k)
+                if results:
+                    return results
 
         return self.query(query_text, filters=None, top_k=top_k)
 
 
+    # ========================================================
+    # 4. 비동기 버전 (여러 검색 문장을 동시에 처리)
+    # ========================================================
+
+    async def aquery(
+        self,
+        query_text: str,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """
+        query()의 비동기 버전. 임베딩/Chroma 호출은 동기 라이브러리라 스레드에서 실행한다.
+        여러 개를 동시에 돌리면 임베딩 요청은 배처가 한 번의 API 호출로 묶고,
+        그동안 먼저 끝난 문장의 Chroma 검색이 진행된다.
+        """
+        return await asyncio.to_thread(self.query, query_text, filters, top_k)
+
+    async def asearch(
+        self,
+        query_text: str,
+        state: Optional[Any] = None,
+        top_k: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """search()의 비동기 버전."""
+        return await asyncio.to_thread(self.search, query_text, state, top_k)
+
+    async def asearch_many(
+        self,
+        query_texts: Sequence[str],
+        state: Optional[Any] = None,
+        top_k: Optional[int] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        여러 검색 문장(무드별/카테고리별 변형 등)을 동시에 search() → 입력 순서대로 결과 리스트.
+        """
+        return list(await asyncio.gather(
+            *(self.asearch(q, state=state, top_k=top_k) for q in query_texts)
+        ))
+
+
 # ============================================================
-# 4. 단독 테스트용 실행
+# 5. 단독 테스트용 실행
 # ============================================================
 
 if __name__ == "__main__":
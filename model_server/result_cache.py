@@ -0,0 +1,199 @@
+# result_cache.py
+"""
+결정적인(deterministic) 모델 호출 결과를 디스크에 저장해 두는 간단한 캐시.
+
+- parse_user_query()의 LLM JSON 파싱 결과 (greedy 디코딩이라 입력이 같으면 결과도 같음)
+- analyze_room_image()의 VLM 분석 결과 (이미지 바이트 해시 기준)
+
+서버를 재시작해도 캐시가 유지되도록 표준 라이브러리 sqlite3만 사용한다.
+값은 JSON으로 직렬화해서 저장한다.
+
+임베딩 벡터처럼 읽기가 대부분인 float 벡터는 open_vector_cache()로 연다.
+lmdb가 설치되어 있으면 memory-mapped LMDB(읽기 락 없음, float32 바이너리)를,
+없으면 같은 인터페이스의 DiskCache를 돌려준다.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from config import CACHE_DIR
+
+try:
+    # 선택 의존성: 있으면 벡터 캐시를 LMDB로 (여러 스레드가 락 없이 동시에 읽음)
+    import lmdb
+except ImportError:
+    lmdb = None
+
+
+def make_key(*parts: Any) -> str:
+    """여러 조각(문자열/바이트)을 하나의 sha256 키로 만든다."""
+    h = hashlib.sha256()
+    for p in parts:
+        if isinstance(p, str):
+            p = p.encode("utf-8")
+        elif not isinstance(p, (bytes, bytearray)):
+            p = repr(p).encode("utf-8")
+        h.update(p)
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class DiskCache:
+    """
+    sqlite3 기반 key-value 캐시 (TTL 지원).
+
+    - get(key)              → 값 또는 None (만료된 항목은 None)
+    - set(key, value, ttl)  → JSON 직렬화 가능한 값 저장
+    - get_many(keys)        → {key: 값} (찾은 것만)
+    - set_many(items, ttl)  → 여러 개를 한 트랜잭션으로 저장
+    """
+
+    def __init__(self, name: str, default_ttl: Optional[float] = None):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        self.path = CACHE_DIR / f"{name}.sqlite3"
+        self.default_ttl = default_ttl
+
+        # FastAPI 스레드풀에서 동시에 접근하므로 연결 하나를 락으로 보호
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL"
+                ")"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            return None
+
+        try:
+            return json.loads(value)
+        except Exception:
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, payload, expires_at),
+            )
+            self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        if not keys:
+            return out
+
+        now = time.time()
+        rows = []
+        with self._lock:
+            # sqlite 바인딩 변수 개수 제한(기본 999)을 넘지 않도록 나눠서 조회
+            for i in range(0, len(keys), 500):
+                chunk = keys[i : i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(self._conn.execute(
+                    f"SELECT key, value, expires_at FROM cache WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall())
+
+        for key, value, expires_at in rows:
+            if expires_at is not None and expires_at < now:
+                continue
+            try:
+                out[key] = json.loads(value)
+            except Exception:
+                continue
+        return out
+
+    def set_many(self, items: Iterable[Tuple[str, Any]], ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        rows = [
+            (key, json.dumps(value, ensure_ascii=False), expires_at)
+            for key, value in items
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+
+class VectorCache:
+    """
+    LMDB 기반 float 벡터 캐시 (만료 없음). DiskCache와 같은 get / get_many / set_many 제공.
+
+    - 값은 float32 바이트로 저장 (OpenAI 임베딩은 원래 float32라 손실 없음)
+    - 읽기는 mmap된 페이지에서 바로 복사하므로 writer와 상관없이 락 없이 동시에 가능
+    - get / get_many는 float32 ndarray를 돌려준다 (파이썬 float 리스트로 풀지 않음)
+    """
+
+    def __init__(self, name: str, map_size: int = 2 << 30):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        self.path = CACHE_DIR / f"{name}.lmdb"
+        self._env = lmdb.open(str(self.path), map_size=map_size, max_readers=128)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._env.begin(buffers=True) as txn:
+            buf = txn.get(key.encode("ascii"))
+            # 버퍼는 트랜잭션 안에서만 유효하므로 복사본(memcpy 한 번)으로 반환
+            return None if buf is None else np.frombuffer(buf, dtype=np.float32).copy()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        out: Dict[str, np.ndarray] = {}
+        with self._env.begin(buffers=True) as txn:
+            for key in keys:
+                buf = txn.get(key.encode("ascii"))
+                if buf is not None:
+                    out[key] = np.frombuffer(buf, dtype=np.float32).copy()
+        return out
+
+    def set_many(self, items: Iterable[Tuple[str, Any]], ttl: Optional[float] = None) -> None:
+        rows = [
+            (key.encode("ascii"), np.asarray(value, dtype=np.float32).tobytes())
+            for key, value in items
+        ]
+        if not rows:
+            return
+        try:
+            with self._env.begin(write=True) as txn:
+                for k, v in rows:
+                    txn.put(k, v)
+        except lmdb.MapFullError:
+            # 캐시 용량(map_size)을 다 쓴 경우: 저장만 건너뛴다 (다음에 다시 계산)
+            pass
+
+
+def open_vector_cache(name: str) -> Union[VectorCache, DiskCache]:
+    """벡터 캐시 열기 (lmdb가 있으면 VectorCache, 없으면 DiskCache)."""
+    if lmdb is not None:
+        return VectorCache(name)
+    return DiskCache(name)
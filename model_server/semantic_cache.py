@@ -0,0 +1,179 @@
+# semantic_cache.py
+"""
+의미 기반(semantic) 캐시. /chat/text 응답과 RAG 검색 결과(rag_retriever)에 사용.
+
+- 키: (정규화된 문장의 임베딩, state_hash)
+  (/chat/text는 세션 상태 + 최근 대화의 해시, RAG 검색은 top_k/where 필터)
+- 해시가 완전히 같고 정규화된 문장까지 똑같으면 임베딩 API도 부르지 않고 바로 찾는다.
+- 문장 임베딩 코사인 유사도가 threshold 이상인 항목도 찾아 주지만, 재사용 여부는
+  호출 측이 확인한다. (/chat/text는 파싱 결과/모드가 같을 때만 응답을 재사용)
+
+메모리 안에서만 유지하며 LRU + TTL + 총 용량(bytes) 상한을 둔다.
+유사도 조회용 임베딩은 state_hash별 float32 행렬로 따로 모아 두어서
+조회 한 번이 행렬곱 한 번으로 끝난다. (전체 항목을 돌지 않음)
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class _Entry:
+    state_hash: str
+    response: Dict[str, Any]
+    expires_at: float
+    nbytes: int
+    row: int = -1  # _Group 행렬에서의 행 번호 (정규화된 float32 임베딩은 행렬에만 보관)
+
+
+class _Group:
+    """같은 state_hash 항목들의 임베딩 행렬 (앞에서부터 len(keys)행만 유효)."""
+
+    __slots__ = ("keys", "mat", "expires")
+
+    def __init__(self, dim: int):
+        self.keys: List[Tuple[str, str]] = []
+        self.mat = np.empty((8, dim), dtype=np.float32)
+        self.expires = np.empty(8, dtype=np.float64)
+
+    def add(self, key: Tuple[str, str], entry: _Entry, vec: np.ndarray) -> None:
+        n = len(self.keys)
+        if n == len(self.mat):
+            # 용량이 차면 두 배로 늘림 (store마다 재할당하지 않도록)
+            self.mat = np.concatenate([self.mat, np.empty_like(self.mat)])
+            self.expires = np.concatenate([self.expires, np.empty_like(self.expires)])
+        self.mat[n] = vec
+        self.expires[n] = entry.expires_at
+        entry.row = n
+        self.keys.append(key)
+
+    def remove(self, entry: _Entry, entries: "OrderedDict[Tuple[str, str], _Entry]") -> None:
+        """entry의 행을 마지막 행으로 덮어써서 지움 (O(1))."""
+        row = entry.row
+        last = len(self.keys) - 1
+        if row != last:
+            moved_key = self.keys[last]
+            self.mat[row] = self.mat[last]
+            self.expires[row] = self.expires[last]
+            self.keys[row] = moved_key
+            entries[moved_key].row = row
+        self.keys.pop()
+
+
+class SmartRAGCache:
+    """
+    - get_exact(text, state_hash)       → 정규화 문장이 같은 항목 (임베딩 불필요)
+    - lookup(embedding, state_hash)     → 유사도 threshold 이상인 가장 가까운 항목
+    - store(text, embedding, state_hash, response)
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl: float = 3600,
+        max_entries: int = 2048,
+        max_bytes: int = 128 * 1024 * 1024,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._groups: Dict[str, _Group] = {}
+        self._bytes = 0
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        return " ".join(text.split())
+
+    def get_exact(self, text: str, state_hash: str) -> Optional[Dict[str, Any]]:
+        key = (self.normalize_text(text), state_hash)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.response
+
+    def lookup(self, embedding: np.ndarray, state_hash: str) -> Optional[Dict[str, Any]]:
+        q = self._unit(embedding)
+        now = time.time()
+        with self._lock:
+            group = self._groups.get(state_hash)
+            if group is None:
+                return None
+            n = len(group.keys)
+            sims = group.mat[:n] @ q
+            sims[group.expires[:n] < now] = -np.inf  # 만료 항목은 후보에서 제외
+            best = int(np.argmax(sims))
+            if float(sims[best]) < self.threshold:
+                return None
+
+            key = group.keys[best]
+            self._entries.move_to_end(key)
+            return self._entries[key].response
+
+    def store(
+        self,
+        text: str,
+        embedding: np.ndarray,
+        state_hash: str,
+        response: Dict[str, Any],
+    ) -> None:
+        key = (self.normalize_text(text), state_hash)
+        vec = self._unit(embedding)
+        nbytes = vec.nbytes + len(json.dumps(response, ensure_ascii=False, default=str).encode("utf-8"))
+        if nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            entry = _Entry(
+                state_hash=state_hash,
+                response=response,
+                expires_at=time.time() + self.ttl,
+                nbytes=nbytes,
+            )
+            self._entries[key] = entry
+            group = self._groups.get(state_hash)
+            if group is None:
+                group = self._groups[state_hash] = _Group(vec.shape[0])
+            group.add(key, entry, vec)
+            self._bytes += nbytes
+
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        group = self._groups[entry.state_hash]
+        group.remove(entry, self._entries)
+        if not group.keys:
+            del self._groups[entry.state_hash]
+        del self._entries[key]
+        self._bytes -= entry.nbytes
+
+    @staticmethod
+    def _unit(embedding: Any) -> np.ndarray:
+        v = np.asarray(embedding, dtype=np.float32)
+        n = float(np.linalg.norm(v))
+        return v / n if n > 0 else v
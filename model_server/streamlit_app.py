@@ -10,8 +10,10 @@ MoodOn – 무드 기반 인테리어 추천 챗봇 (Streamlit 프론트엔드,
        streamlit run streamlit_app.py
 """
 
+import threading
 import uuid
-import requests
+
+import httpx
 import streamlit as st
 
 # =========================
@@ -20,6 +22,36 @@ import streamlit as st
 
 MODEL_SERVER_URL = "http://127.0.0.1:8000"  # 나중에 EC2 올리면 이 주소만 바꾸면 됨
 
+
+@st.cache_resource
+def _http() -> httpx.Client:
+    """
+    모델 서버용 HTTP 클라이언트 (rerun/세션 사이에 공유 → 커넥션 재사용).
+    기본 타임아웃은 이미지 분석 기준 300초, 요청별로 덮어쓸 수 있음.
+    """
+    return httpx.Client(
+        base_url=MODEL_SERVER_URL,
+        timeout=300,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    )
+
+
+@st.cache_resource
+def _warm_model_server() -> bool:
+    """
+    앱 프로세스가 뜰 때 한 번만 모델 서버 /warmup을 백그라운드로 호출.
+    사용자가 첫 메시지를 입력하기 전에 서버의 임베딩/검색 경로를 데워 둔다. (실패해도 무시)
+    """
+    def _ping() -> None:
+        try:
+            _http().post("/warmup", timeout=60)
+        except Exception:
+            pass
+
+    threading.Thread(target=_ping, daemon=True).start()
+    return True
+
+
 # =========================
 # 세션 상태 초기화
 # =========================
@@ -49,6 +81,8 @@ st.set_page_config(
     page_icon="🛋️",
 )
 
+_warm_model_server()
+
 # 상단 제목
 st.markdown("# 🛋️ MoodOn – 무드 기반 인테리어 추천 챗봇")
 st.caption("방 사진과 취향을 기반으로, 어울리는 인테리어 무드를 함께 찾아봐요.")
@@ -62,8 +96,8 @@ st.sidebar.code(session_id, language="text")
 
 if st.sidebar.button("세션 초기화", use_container_width=True):
     try:
-        resp = requests.post(
-            f"{MODEL_SERVER_URL}/session/reset",
+        resp = _http().post(
+            "/session/reset",
             json={"session_id": session_id},
             timeout=10,
         )
@@ -108,12 +142,13 @@ with tab_chat:
         with st.chat_message("assistant"):
             with st.spinner("MoodOn이 답변을 준비하고 있어요..."):
                 try:
-                    resp = requests.post(
-                        f"{MODEL_SERVER_URL}/chat/text",
+                    resp = _http().post(
+                        "/chat/text",
                         json={
                             "session_id": session_id,
                             "message": prompt,
                         },
+                        timeout=None,  # LLM 응답은 시간 제한 없이 기다림
                     )
                     if resp.status_code == 200:
                         data = resp.json()
@@ -196,8 +231,10 @@ with tab_image:
             st.session_state.is_image_processing = True
             is_want = bool(btn_want)
 
+            # 업로드 파일 객체를 그대로 넘겨서 바이트를 한 번 더 복사하지 않고 스트리밍
+            image_file.seek(0)
             files = {
-                "file": (image_file.name, image_file.read(), image_file.type),
+                "file": (image_file.name, image_file, image_file.type),
             }
             data = {
                 "session_id": session_id,
@@ -207,11 +244,10 @@ with tab_image:
             label = "현재 방" if not is_want else "원하는 분위기(레퍼런스)"
             with st.spinner(f"{label} 이미지 분석 중... (VLM 호출)"):
                 try:
-                    resp = requests.post(
-                        f"{MODEL_SERVER_URL}/chat/image",
+                    resp = _http().post(
+                        "/chat/image",
                         data=data,
                         files=files,
-                        timeout=300,
                     )
                 except Exception as e:
                     st.error(f"요청 실패: {e}")
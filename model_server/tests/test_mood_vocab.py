@@ -0,0 +1,64 @@
+# tests/test_mood_vocab.py
+"""
+_snap_one(rapidfuzz로 후보를 거른 뒤 difflib으로 선택)이 difflib 단독 결과와
+동점 처리까지 똑같은지 검증. (인덱스의 mood_keywords / mood_bits가
+rapidfuzz 설치 여부에 따라 달라지면 안 됨)
+
+실행: (model_server 폴더에서) python -m unittest discover tests
+"""
+
+import difflib
+import random
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import mood_vocab  # noqa: E402
+
+
+@unittest.skipIf(mood_vocab.process is None, "rapidfuzz 미설치 (difflib 경로만 사용)")
+class SnapOneMatchesDifflibTest(unittest.TestCase):
+    CUTOFFS = (0.72, 0.5)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.vocab = list(mood_vocab.get_mood_vocab())
+        if not cls.vocab:
+            raise unittest.SkipTest("무드 사전 파일이 없음")
+
+    def _assert_same(self, probes):
+        for s in probes:
+            for cutoff in self.CUTOFFS:
+                expected = difflib.get_close_matches(s, self.vocab, n=1, cutoff=cutoff)
+                self.assertEqual(
+                    mood_vocab._snap_one(s, cutoff),
+                    expected[0] if expected else None,
+                    f"{s!r} (cutoff={cutoff})",
+                )
+
+    def test_known_tie_case(self):
+        # rapidfuzz extractOne 단독이면 difflib과 다른 키워드를 고르던 입력
+        self._assert_same(["금빛"])
+
+    def test_vocab_neighbours(self):
+        rng = random.Random(0)
+        chars = sorted(set("".join(self.vocab)))
+        probes = [w[:-1] for w in self.vocab if len(w) > 1]
+        probes += [w + rng.choice(chars) for w in self.vocab]
+        probes += [w[1:] for w in self.vocab if len(w) > 1]
+        self._assert_same(probes)
+
+    def test_random_strings(self):
+        rng = random.Random(1)
+        chars = sorted(set("".join(self.vocab)))
+        probes = [
+            "".join(rng.choice(chars) for _ in range(rng.randint(1, 5)))
+            for _ in range(3000)
+        ]
+        self._assert_same(probes)
+
+
+if __name__ == "__main__":
+    unittest.main()
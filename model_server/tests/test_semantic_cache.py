@@ -0,0 +1,112 @@
+# tests/test_semantic_cache.py
+"""
+SmartRAGCache의 state_hash별 임베딩 행렬(_Group) 관리 검증.
+
+store / lookup / 만료 / LRU 축출을 무작위로 섞어서 돌리고, 매 조회 결과를
+전체 항목을 직접 훑는 단순 구현(참조)과 비교한다.
+
+실행: (model_server 폴더에서) python -m unittest discover tests
+"""
+
+import random
+import sys
+import unittest
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import semantic_cache  # noqa: E402
+from semantic_cache import SmartRAGCache  # noqa: E402
+
+
+def _unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+class SmartRAGCacheGroupTest(unittest.TestCase):
+    THRESHOLD = 0.9
+    MAX_ENTRIES = 50
+
+    def setUp(self):
+        self.now = 1000.0
+        self._orig_time = semantic_cache.time.time
+        semantic_cache.time.time = lambda: self.now
+
+    def tearDown(self):
+        semantic_cache.time.time = self._orig_time
+
+    def _check_rows(self, cache):
+        """모든 항목이 자기 그룹 행렬의 올바른 행을 가리키는지."""
+        total = 0
+        for state_hash, group in cache._groups.items():
+            self.assertTrue(group.keys, "빈 그룹은 지워져야 함")
+            for row, key in enumerate(group.keys):
+                entry = cache._entries[key]
+                self.assertEqual(entry.row, row)
+                self.assertEqual(entry.state_hash, state_hash)
+            total += len(group.keys)
+        self.assertEqual(total, len(cache._entries))
+
+    def test_matches_brute_force_reference(self):
+        rng = random.Random(1)
+        np_rng = np.random.default_rng(1)
+        cache = SmartRAGCache(
+            threshold=self.THRESHOLD, ttl=1000, max_entries=self.MAX_ENTRIES
+        )
+        # key → (단위 벡터, state_hash, 응답, 만료 시각), LRU 순서
+        ref: "OrderedDict" = OrderedDict()
+        base = [np_rng.standard_normal(16).astype(np.float32) for _ in range(30)]
+
+        for step in range(20000):
+            state_hash = rng.choice("abc")
+            i = rng.randrange(len(base))
+            text = f"t{i}"
+            vec = base[i] + np_rng.standard_normal(16).astype(np.float32) * 0.05
+            op = rng.random()
+
+            if op < 0.4:
+                response = {"i": i, "step": step}
+                cache.store(text, vec, state_hash, response)
+                key = (text, state_hash)
+                ref.pop(key, None)
+                ref[key] = (_unit(vec), state_hash, response, self.now + 1000)
+                while len(ref) > self.MAX_ENTRIES:
+                    ref.popitem(last=False)
+            elif op < 0.9:
+                q = _unit(vec)
+                candidates = [
+                    (float(v @ q), key)
+                    for key, (v, h, _, exp) in ref.items()
+                    if h == state_hash and exp >= self.now
+                ]
+                expected = None
+                if candidates:
+                    sim, key = max(candidates)
+                    if sim >= self.THRESHOLD:
+                        expected = ref[key][2]
+                        ref.move_to_end(key)
+                self.assertEqual(cache.lookup(vec, state_hash), expected, f"step {step}")
+            else:
+                self.now += rng.choice([0, 10, 300])
+
+            if step % 500 == 0:
+                self._check_rows(cache)
+
+        self.assertEqual(len(cache._entries), len(ref))
+        self._check_rows(cache)
+
+    def test_remove_last_group_entry_drops_group(self):
+        cache = SmartRAGCache(threshold=0.5, max_entries=1)
+        cache.store("a", np.ones(4), "h1", {"a": 1})
+        cache.store("b", np.ones(4), "h2", {"b": 1})  # max_entries=1 → "a" 축출
+        self.assertNotIn("h1", cache._groups)
+        self.assertIsNone(cache.lookup(np.ones(4), "h1"))
+        self.assertEqual(cache.lookup(np.ones(4), "h2"), {"b": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()